@@ -0,0 +1,105 @@
+"""
+Advisor reply latency against benchmarks/fake_openai.py: the old handler
+(advice, then the scratch pad rewrite, then the reply) against /advisor,
+which replies once the advice is ready. Then sends a burst of messages to
+one advisor and checks they share one pad rewrite, and that waiting for the
+pads, as end_turn does, leaves nothing pending.
+
+    PYTHONPATH=src python benchmarks/advisor_latency.py --latency 1 --burst 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import statistics
+import time
+
+PORT = 8098
+
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+os.environ.setdefault('MAPGEN_WORKERS', '1')
+os.environ.setdefault('OPENROUTER_KEY', 'unused')
+os.environ['LLM_BASE_URL'] = f'http://127.0.0.1:{PORT}/v1'
+
+
+async def timed(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=1.0, help='seconds per model call')
+    parser.add_argument('--burst', type=int, default=10, help='messages sent to one advisor at once')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    from fake_openai import serve
+    server = multiprocessing.Process(target=serve, args=(PORT, args.latency, 0.0), daemon=True)
+    server.start()
+
+    import httpx
+    import server.main as app_module
+    from llm.advisor_agent import get_advice, update_scratch_pad
+
+    calls = []
+    update = app_module.pads.update
+
+    async def recording_update(game_id, faction_id, messages):
+        calls.append(messages)
+        await update(game_id, faction_id, messages)
+
+    app_module.pads.update = recording_update
+
+    async with app_module.lifespan(app_module.app):
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test', timeout=60) as http:
+            for _ in range(100):
+                try:
+                    game = (await http.post('/create-game', json={'owner': 'bench', 'number_people': 3,
+                                                                  'grain': 100, 'seed': 1})).json()
+                    break
+                except httpx.HTTPError:
+                    await asyncio.sleep(0.2)
+            game_id, faction_id = game['game_id'], game['factions'][0]['faction_id']
+            cache = app_module.cache
+
+            async def old_handler():
+                state = app_module.state_to_yaml(await cache.get_state(game_id))
+                context, pad = await cache.get_context(game_id), await cache.get_pad(game_id, faction_id)
+                await get_advice(faction_id, context, state, pad, 'hello')
+                await cache.set_pad(game_id, faction_id, await update_scratch_pad(faction_id, context, state, pad, 'hello'))
+
+            async def new_handler():
+                r = await http.post('/advisor', json={'game_id': game_id, 'faction_id': faction_id, 'message': 'hello'})
+                r.raise_for_status()
+
+            before = await timed(old_handler, args.repeat)
+            after = await timed(new_handler, args.repeat)
+            await app_module.pads.wait(game_id)
+            print(f"advisor reply: {before:.2f}s before, {after:.2f}s now ({args.latency:g}s per model call)")
+
+            calls.clear()
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                http.post('/advisor', json={'game_id': game_id, 'faction_id': faction_id, 'message': f'message {i}'})
+                for i in range(args.burst)
+            ))
+            replied = time.perf_counter() - start
+            await app_module.pads.wait(game_id)
+            settled = time.perf_counter() - start
+
+            assert sorted(m for c in calls for m in c) == sorted(f'message {i}' for i in range(args.burst))
+            assert not app_module.pads.tasks
+            print(f"burst of {args.burst}: all replied in {replied:.2f}s, {len(calls)} pad rewrite(s), "
+                  f"pads current after {settled:.2f}s")
+
+    server.terminate()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+"""
+Applies a turn's worth of tool calls, and the events they turn into, to maps
+with thousands of provinces, once with GameState's id indexes and once with
+the linear get_province / get_faction scans they replaced, and checks both
+end in the same state.
+
+    PYTHONPATH=src python benchmarks/apply_turn.py --grains 1000 5000 20000 --calls 100 500
+"""
+import argparse
+import copy
+import os
+import random
+import time
+from dataclasses import asdict
+
+os.environ.setdefault('OPENROUTER_KEY', 'unused')
+
+from create_game.create_game import make_game
+from create_game.schema import GameState, get_province, get_faction
+from llm.end_turn_agent import apply_tool_call
+from storage.event_log import apply_events
+
+
+def tool_calls(game_state: GameState, n: int, rng: random.Random):
+    land = [p for p in game_state.provinces if not p.is_ocean]
+    factions = [f.faction_id for f in game_state.factions]
+    calls = []
+    for _ in range(n):
+        p = rng.choice(land)
+        match rng.choice(["add_to_army", "subtract_from_army", "capture_province"]):
+            case "capture_province":
+                calls.append(("capture_province", {"province_id": p.province_id, "faction_id": rng.choice(factions)}))
+            case name:
+                calls.append((name, {"province_id": p.province_id, "number": rng.randint(1, 100)}))
+    return calls
+
+
+def events_for(updates):
+    """What update_game_state turns the updates into."""
+    events = []
+    for u in updates:
+        if u["type"] == "province":
+            events.append({"type": "army", "province_id": u["id"],
+                           "army": asdict(u["data"].army) if u["data"].army else None})
+            events.append({"type": "capture", "province_id": u["id"], "faction_id": u["data"].faction_id})
+        elif u["data"].is_defeated:
+            events.append({"type": "defeat", "faction_id": u["id"]})
+    return events
+
+
+def run(game_state: GameState, calls, replay: GameState):
+    start = time.perf_counter()
+    updates = []
+    for name, args in calls:
+        updates.extend(apply_tool_call(name, args, game_state))
+    tools = time.perf_counter() - start
+
+    events = events_for(updates)
+    start = time.perf_counter()
+    apply_events(replay, events)
+    return tools, time.perf_counter() - start, len(events)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--grains', type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument('--calls', type=int, nargs='+', default=[100, 500])
+    parser.add_argument('--players', type=int, default=6)
+    args = parser.parse_args()
+
+    indexed = (GameState.province, GameState.faction)
+    linear = (lambda self, pid: get_province(self.provinces, pid),
+              lambda self, fid: get_faction(self.factions, fid))
+
+    print(f"{'grain':>6} {'provinces':>9} {'calls':>6} {'events':>7} {'lookup':>7} {'tools ms':>9} {'events ms':>10}")
+    for grain in args.grains:
+        base = make_game('bench', args.players, grain, seed=grain)
+        for n in args.calls:
+            calls = tool_calls(base, n, random.Random(n))
+            finals = []
+            for label, (province, faction) in (('linear', linear), ('indexed', indexed)):
+                GameState.province, GameState.faction = province, faction
+                game_state, replay = copy.deepcopy(base), copy.deepcopy(base)
+                tools, events, n_events = run(game_state, calls, replay)
+                finals.append(asdict(replay))
+                print(f"{grain:>6} {len(base.provinces):>9} {n:>6} {n_events:>7} {label:>7} "
+                      f"{1e3 * tools:>9.2f} {1e3 * events:>10.2f}")
+            GameState.province, GameState.faction = indexed
+            assert finals[0] == finals[1], "indexed and linear lookups disagree"
+
+
+if __name__ == '__main__':
+    main()
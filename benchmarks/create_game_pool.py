@@ -0,0 +1,69 @@
+"""
+Generates several maps concurrently, first inline on the event loop (the old
+/create-game behaviour) and then through the MapGenerator process pool,
+reporting wall time and how long the event loop went without running.
+
+    PYTHONPATH=src python benchmarks/create_game_pool.py --games 8 --grain 500 --workers 4
+"""
+import argparse
+import asyncio
+import time
+
+from create_game.create_game import make_game
+from server.generation import MapGenerator
+
+
+async def loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Longest gap between ticks that should be `interval` apart."""
+    worst = 0.0
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(interval)
+        now = time.perf_counter()
+        worst = max(worst, now - last - interval)
+        last = now
+    return worst
+
+
+async def inline(n: int, grain: int, players: int):
+    async def one():
+        return make_game('bench', players, grain)
+    await asyncio.gather(*(one() for _ in range(n)))
+
+
+async def pooled(generator: MapGenerator, n: int, grain: int, players: int):
+    await asyncio.gather(*(generator.generate('bench', players, grain) for _ in range(n)))
+
+
+async def measure(label: str, work) -> None:
+    stop = asyncio.Event()
+    lag = asyncio.create_task(loop_lag(stop))
+    start = time.perf_counter()
+    await work
+    elapsed = time.perf_counter() - start
+    stop.set()
+    print(f"{label:>8}: {elapsed:6.2f}s total, event loop stalled up to {1e3 * await lag:8.1f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--games', type=int, default=8)
+    parser.add_argument('--grain', type=int, default=500)
+    parser.add_argument('--players', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=None, help='pool size (default: cores)')
+    args = parser.parse_args()
+
+    generator = MapGenerator(workers=args.workers, max_pending=args.games)
+    generator.start()
+    # Pay for interpreter start-up and imports before timing
+    await asyncio.gather(*(generator.generate('warmup', args.players, 100) for _ in range(generator.workers)),
+                         return_exceptions=True)
+
+    print(f"{args.games} maps at grain {args.grain}, {generator.workers} pool workers")
+    await measure('inline', inline(args.games, args.grain, args.players))
+    await measure('pool', pooled(generator, args.games, args.grain, args.players))
+    await generator.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+"""
+Starts an event bus broker and several worker processes, then publishes game
+messages from one worker and checks that every other worker joined to the
+game receives all of them, reporting throughput and delivery latency.
+
+    PYTHONPATH=src python benchmarks/event_bus.py --workers 4 --games 20 --messages 2000
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+from server.bus import UnixSocketBus, run_broker
+
+
+async def wait_connected(bus: UnixSocketBus):
+    while not bus.connected:
+        await asyncio.sleep(0.01)
+
+
+def listener(path: str, games: list, expected: int, ready, results):
+    async def run():
+        received = []
+        done = asyncio.Event()
+
+        def on_message(game_id: str, text: str):
+            received.append(time.time() - json.loads(text)["sent"])
+            if len(received) == expected:
+                done.set()
+
+        bus = UnixSocketBus(path)
+        bus.subscribe(on_message)
+        for game_id in games:
+            bus.join(game_id)
+        await bus.start()
+        await wait_connected(bus)
+        ready.set()
+
+        try:
+            await asyncio.wait_for(done.wait(), 60)
+        except asyncio.TimeoutError:
+            pass
+        await bus.close()
+        results.put(received)
+
+    asyncio.run(run())
+
+
+async def publish(path: str, games: list, n: int, size: int) -> float:
+    bus = UnixSocketBus(path, max_queue=n)
+    await bus.start()
+    await wait_connected(bus)
+
+    padding = 'x' * size
+    start = time.perf_counter()
+    for i in range(n):
+        bus.publish(games[i % len(games)], json.dumps({"event": "turn_processed", "sent": time.time(), "pad": padding}))
+        if i % 100 == 0:
+            await asyncio.sleep(0)
+    while bus.outbox.qsize():
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    await bus.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4, help='listening worker processes')
+    parser.add_argument('--games', type=int, default=20)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--size', type=int, default=1024, help='message padding (bytes)')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bus.sock')
+    broker = multiprocessing.Process(target=run_broker, args=(path,), daemon=True)
+    broker.start()
+    while not os.path.exists(path):
+        time.sleep(0.01)
+
+    games = [f'game-{i}' for i in range(args.games)]
+    # Odd workers only join the first half of the games
+    joined = [games if w % 2 == 0 else games[:len(games) // 2] for w in range(args.workers)]
+    expected = [sum(1 for i in range(args.messages) if games[i % len(games)] in j) for j in joined]
+
+    results = multiprocessing.Queue()
+    listeners = []
+    for w in range(args.workers):
+        ready = multiprocessing.Event()
+        p = multiprocessing.Process(target=listener, args=(path, joined[w], expected[w], ready, results))
+        p.start()
+        ready.wait()
+        listeners.append(p)
+
+    elapsed = asyncio.run(publish(path, games, args.messages, args.size))
+
+    latencies = []
+    received = []
+    for _ in listeners:
+        r = results.get()
+        received.append(len(r))
+        latencies.extend(r)
+    for p in listeners:
+        p.join()
+    broker.terminate()
+
+    assert sorted(received) == sorted(expected), f"expected {sorted(expected)} deliveries, got {sorted(received)}"
+    latencies.sort()
+    print(f"{args.messages} messages to {args.workers} workers in {elapsed:.2f}s "
+          f"({args.messages / elapsed:,.0f} msg/s published, {sum(received):,} delivered)")
+    print(f"delivery latency: median {1e3 * statistics.median(latencies):.1f} ms, "
+          f"p99 {1e3 * latencies[int(0.99 * (len(latencies) - 1))]:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Times get_seeds + expand_continents across grains at a fixed land fraction
+and checks the result: continents are disjoint, connected, and cover the
+requested share of the map. Then checks that maps made without a land
+fraction are as land-heavy as the original random-pick growth made them.
+
+    PYTHONPATH=src python benchmarks/expand_continents.py --grains 1000 10000 100000 --land-fraction 0.3
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+import scipy as sp
+
+from create_game.continents import run_voronoi, find_neighbors, get_seeds, expand_continents
+
+
+def connected(adj, tiles) -> bool:
+    sub = adj[tiles][:, tiles]
+    n_components, _ = sp.sparse.csgraph.connected_components(sub, directed=False)
+    return n_components == 1
+
+
+def original_expand(adj, continents, rounds: int, rng: random.Random):
+    """The growth expand_continents replaced, kept as the reference for default maps."""
+    for _ in range(rounds):
+        for tls in continents.values():
+            t = rng.choice(tls)
+            tls.append(rng.choice(adj.indices[adj.indptr[t]:adj.indptr[t + 1]].tolist()))
+    return continents
+
+
+def land_share(grain: int, players: int, seed: int, expand) -> float:
+    np_rng, rng = np.random.default_rng(seed), random.Random(seed)
+    vor = run_voronoi(grain=grain, rng=np_rng)
+    adj, _ = find_neighbors(vor.filtered_regions, vor.vertices, rng=rng)
+    continents = expand(adj, get_seeds(adj, n=players, rng=rng), rng)
+    return len({t for tls in continents.values() for t in tls}) / adj.shape[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--grains', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--players', type=int, default=6)
+    parser.add_argument('--land-fraction', type=float, default=0.3)
+    parser.add_argument('--seeds', type=int, default=10, help='maps per case in the default land check')
+    args = parser.parse_args()
+
+    print(f"{'grain':>7} {'edges':>8} {'seconds':>8} {'ns/edge':>8} {'land':>6} {'smallest':>9} {'largest':>8}")
+    for grain in args.grains:
+        np.random.seed(grain)
+        random.seed(grain)
+        vor = run_voronoi(grain=grain)
+        adj, _ = find_neighbors(vor.filtered_regions, vor.vertices)
+
+        start = time.perf_counter()
+        seeds = get_seeds(adj, n=args.players)
+        continents = expand_continents(adj, seeds, land_fraction=args.land_fraction)
+        elapsed = time.perf_counter() - start
+
+        tiles = [t for tls in continents.values() for t in tls]
+        assert len(tiles) == len(set(tiles)), "continents overlap"
+        assert all(connected(adj, tls) for tls in continents.values()), "a continent is not connected"
+
+        sizes = sorted(len(tls) for tls in continents.values())
+        edges = adj.nnz // 2
+        print(f"{grain:>7} {edges:>8} {elapsed:>8.3f} {1e9 * elapsed / edges:>8.0f} "
+              f"{len(tiles) / adj.shape[0]:>6.3f} {sizes[0]:>9} {sizes[-1]:>8}")
+
+    print(f"\n{'grain':>7} {'players':>8} {'original':>9} {'default':>8}   mean land share, {args.seeds} seeds")
+    for grain, players in [(100, 6), (100, 8), (300, 6), (1000, 6)]:
+        original = np.mean([land_share(grain, players, s, lambda adj, c, rng: original_expand(adj, c, 20, rng))
+                            for s in range(args.seeds)])
+        default = np.mean([land_share(grain, players, s, lambda adj, c, rng: expand_continents(adj, c, rng=rng))
+                           for s in range(args.seeds)])
+        print(f"{grain:>7} {players:>8} {original:>9.3f} {default:>8.3f}")
+        assert abs(default - original) < 0.02, "default maps drifted from the original land share"
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+A local OpenAI-compatible chat completions server for exercising the LLM
+client without a real provider. Every reply takes --latency seconds, a
+share of requests (--error-rate) fail with 429 or 503, and requests that
+offer tools get one tool call back. /stats reports how many requests were
+in flight at most.
+
+    PYTHONPATH=src python benchmarks/fake_openai.py --port 8099 --latency 2 --error-rate 0.1
+    LLM_BASE_URL=http://127.0.0.1:8099/v1 PYTHONPATH=src python src/server/main.py
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def make_app(latency: float = 0.5, error_rate: float = 0.0, seed: int | None = None) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(seed)
+    state = {"requests": 0, "failed": 0, "in_flight": 0, "max_in_flight": 0}
+
+    @app.post("/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        state["requests"] += 1
+        state["in_flight"] += 1
+        state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        try:
+            await asyncio.sleep(latency)
+            if rng.random() < error_rate:
+                state["failed"] += 1
+                status = rng.choice([429, 503])
+                return JSONResponse({"error": {"message": "injected failure", "code": status}}, status_code=status,
+                                    headers={"retry-after": "0.1"} if status == 429 else None)
+
+            message = {"role": "assistant", "content": f"fake reply from {body['model']}"}
+            if body.get("tools"):
+                tool = body["tools"][0]["function"]
+                message["content"] = None
+                message["tool_calls"] = [{
+                    "id": f"call_{uuid.uuid4().hex[:8]}",
+                    "type": "function",
+                    "function": {"name": tool["name"], "arguments": json.dumps({"province_id": "p0", "number": 1})},
+                }]
+
+            return {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [{"index": 0, "message": message,
+                             "finish_reason": "tool_calls" if "tool_calls" in message else "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }
+        finally:
+            state["in_flight"] -= 1
+
+    @app.get("/stats")
+    async def stats():
+        return state
+
+    return app
+
+
+def serve(port: int, latency: float, error_rate: float, seed: int | None = None):
+    uvicorn.run(make_app(latency, error_rate, seed), host='127.0.0.1', port=port, log_level='warning')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0.5)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    serve(args.port, args.latency, args.error_rate, args.seed)
@@ -0,0 +1,63 @@
+"""
+Times find_neighbors (sparse, shared-edge adjacency) against the original
+dense all-pairs version across grains, and checks that the two agree apart
+from the corner-only contacts the old version also counted.
+
+    PYTHONPATH=src python benchmarks/find_neighbors.py --grains 100 1000 10000 100000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from create_game.continents import run_voronoi, find_neighbors
+
+
+def find_neighbors_dense(regions) -> np.ndarray:
+    """The original O(n^2) version: any shared vertex makes two regions neighbors."""
+    adjacency_matrix = np.zeros((len(regions), len(regions)))
+    for i1, r1 in enumerate(regions):
+        for i2, r2 in enumerate(regions):
+            if r1 == r2:
+                continue
+            if len(set(r1) & set(r2)) > 0:
+                adjacency_matrix[i1, i2] = 1.0
+    return adjacency_matrix
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--grains', type=int, nargs='+', default=[100, 1000, 10000, 100000])
+    parser.add_argument('--dense-max', type=int, default=2000, help='largest grain to run the dense version on')
+    args = parser.parse_args()
+
+    print(f"{'grain':>7} {'regions':>8} {'sparse s':>9} {'sparse MB':>10} {'dense s':>9} {'dense MB':>9} {'corner only':>12}")
+    for grain in args.grains:
+        np.random.seed(grain)
+        vor = run_voronoi(grain=grain)
+        regions = vor.filtered_regions
+
+        start = time.perf_counter()
+        adj, provinces = find_neighbors(regions, vor.vertices)
+        sparse_s = time.perf_counter() - start
+        sparse_mb = (adj.data.nbytes + adj.indices.nbytes + adj.indptr.nbytes) / 1e6
+
+        assert (adj != adj.T).nnz == 0, "adjacency is not symmetric"
+        assert all(len(p.neighbors) == adj.indptr[i + 1] - adj.indptr[i] for i, p in enumerate(provinces))
+
+        dense_s = dense_mb = corner = '-'
+        if grain <= args.dense_max:
+            start = time.perf_counter()
+            dense = find_neighbors_dense(regions)
+            dense_s = f"{time.perf_counter() - start:.3f}"
+            dense_mb = f"{dense.nbytes / 1e6:.1f}"
+
+            # Every shared edge is a shared vertex, not the other way round
+            assert np.all(dense[adj.nonzero()] == 1.0)
+            corner = f"{int(dense.sum() - adj.nnz) // 2}"
+
+        print(f"{grain:>7} {len(regions):>8} {sparse_s:>9.3f} {sparse_mb:>10.2f} {dense_s:>9} {dense_mb:>9} {corner:>12}")
+
+
+if __name__ == '__main__':
+    main()
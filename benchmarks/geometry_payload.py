@@ -0,0 +1,78 @@
+"""
+Compares the geometry endpoint's float JSON with the compact polyline
+encoding (with and without continent simplification), reporting payload
+size, gzipped size and encode time, and checks that decoded rings are within
+half a grid step of the originals.
+
+    PYTHONPATH=src python benchmarks/geometry_payload.py --grains 100 500 5000 --simplify 0.002
+"""
+import argparse
+import gzip
+import json
+import time
+
+from create_game.create_game import make_game
+from storage.geometry import SCALE, extract_geometry, compact_geometry, decode_polyline
+
+
+def timed(fn, repeat: int = 3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return out, best
+
+
+def check(geometry, compact):
+    worst = 0.0
+    for ring, encoded in zip(geometry.borders, (p["border"] for p in compact["provinces"])):
+        if ring is None:
+            continue
+        decoded = decode_polyline(encoded)
+        assert len(decoded) == len(ring)
+        worst = max(worst, max(max(abs(a[0] - b[0]), abs(a[1] - b[1])) for a, b in zip(ring, decoded)))
+    assert worst <= 0.5 / SCALE + 1e-12, f"quantization error {worst}"
+    return worst
+
+
+def dumps(obj) -> bytes:
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--grains', type=int, nargs='+', default=[100, 500, 5000])
+    parser.add_argument('--players', type=int, default=4)
+    parser.add_argument('--simplify', type=float, default=0.002, help='Douglas-Peucker tolerance for continents')
+    args = parser.parse_args()
+
+    print(f"{'grain':>6} {'encoding':>18} {'bytes':>10} {'gzip':>9} {'ratio':>6} {'encode ms':>10}")
+    for grain in args.grains:
+        geometry = extract_geometry(make_game('bench', args.players, grain, seed=grain))
+
+        # Same shape as Geometry.json_bytes, timed without its cache
+        full, full_s = timed(lambda: dumps({
+            "provinces": [
+                {"province_id": pid, "border": b, "centriod": c, "neighbors": n}
+                for pid, b, c, n in zip(geometry.province_ids, geometry.borders, geometry.centroids, geometry.neighbors)
+            ],
+            "continents": geometry.continents,
+        }))
+        rows = [('json', full, full_s)]
+
+        compact, compact_s = timed(lambda: compact_geometry(geometry))
+        worst = check(geometry, compact)
+        rows.append(('polyline', dumps(compact), compact_s))
+
+        simplified, simplified_s = timed(lambda: compact_geometry(geometry, args.simplify))
+        rows.append((f'polyline+dp {args.simplify:g}', dumps(simplified), simplified_s))
+
+        for label, body, seconds in rows:
+            print(f"{grain:>6} {label:>18} {len(body):>10,} {len(gzip.compress(body)):>9,} "
+                  f"{len(full) / len(body):>5.1f}x {1e3 * seconds:>10.1f}")
+        print(f"{'':>6} max quantization error {worst:.2e} (grid step {1 / SCALE:.2e})")
+
+
+if __name__ == '__main__':
+    main()
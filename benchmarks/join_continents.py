@@ -0,0 +1,81 @@
+"""
+Times join_continents (one coverage union per continent, tiles looked up by
+index) against the original per-tile union with fractal-id lookups, and
+checks both give the same continent shapes and tile owners.
+
+Continents are grown with expand_continents to --land-fraction of the map,
+so each covers a sizeable share of it.
+
+    PYTHONPATH=src python benchmarks/join_continents.py --grains 1000 5000 20000
+"""
+import argparse
+import copy
+import random
+import time
+from typing import Set
+
+import numpy as np
+import shapely
+from shapely import Polygon
+
+from create_game.continents import run_voronoi, find_neighbors, expand_continents, join_continents
+from create_game.schema import get_province_by_fractal
+
+
+def join_continents_incremental(continents, provinces, vor):
+    """The original loop, minus naming."""
+    used_tiles: Set[int] = set()
+    continent_polygons = {}
+    for key, tiles in continents.items():
+        approved_tiles_unique = set(t for t in tiles if t not in used_tiles)
+        used_tiles.update(approved_tiles_unique)
+        p = None
+        for t in approved_tiles_unique:
+            region = vor.filtered_regions[t]
+            tile_polygon = Polygon(vor.vertices[region + [region[0]], :])
+            pv = get_province_by_fractal(provinces, '-'.join([str(f) for f in region]))
+            pv.faction_id = key
+            p = tile_polygon if p is None else shapely.coverage_union(p, tile_polygon).normalize()
+        continent_polygons[key] = p
+    return continent_polygons
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--grains', type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument('--players', type=int, default=4)
+    parser.add_argument('--land-fraction', type=float, default=0.2)
+    parser.add_argument('--incremental-max', type=int, default=5000, help='largest grain to run the original on')
+    args = parser.parse_args()
+
+    print(f"{'grain':>7} {'tiles':>7} {'batch s':>8} {'incremental s':>14}")
+    for grain in args.grains:
+        np.random.seed(grain)
+        random.seed(grain)
+        vor = run_voronoi(grain=grain)
+        adj, provinces = find_neighbors(vor.filtered_regions, vor.vertices)
+
+        seeds = {f'c{i}': [int(s)] for i, s in enumerate(random.sample(range(adj.shape[0]), args.players))}
+        continents = expand_continents(adj, seeds, land_fraction=args.land_fraction)
+        tiles = len(set().union(*continents.values()))
+
+        batch_provinces = copy.deepcopy(provinces)
+        start = time.perf_counter()
+        polygons, _, _ = join_continents(continents, batch_provinces, vor)
+        batch = time.perf_counter() - start
+
+        incremental = '-'
+        if grain <= args.incremental_max:
+            start = time.perf_counter()
+            expected = join_continents_incremental(continents, provinces, vor)
+            incremental = f"{time.perf_counter() - start:.3f}"
+
+            assert [p.faction_id for p in provinces] == [p.faction_id for p in batch_provinces]
+            for key in continents:
+                assert polygons[key].symmetric_difference(expected[key]).area < 1e-9, f"{key} differs"
+
+        print(f"{grain:>7} {tiles:>7} {batch:>8.3f} {incremental:>14}")
+
+
+if __name__ == '__main__':
+    main()
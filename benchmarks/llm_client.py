@@ -0,0 +1,86 @@
+"""
+Runs concurrent model calls against benchmarks/fake_openai.py, first the
+old way (the synchronous OpenAI client called from a coroutine) and then
+through LLMClient, reporting wall time, how long the event loop went
+without running, the most requests the server saw at once, and retries of
+injected 429/503 failures.
+
+    PYTHONPATH=src python benchmarks/llm_client.py --calls 32 --latency 0.5 --concurrency 4 --error-rate 0.2
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+import urllib.request
+
+from openai import OpenAI
+
+from create_game_pool import loop_lag
+from fake_openai import serve
+from llm.client import LLMClient
+
+MODEL = 'fake/model'
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+def server_stats(port: int) -> dict:
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}/stats') as r:
+        return json.load(r)
+
+
+async def measure(label: str, calls, port: int):
+    before = server_stats(port)
+    stop = asyncio.Event()
+    lag = asyncio.create_task(loop_lag(stop))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    results = await asyncio.gather(*calls(), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    after = server_stats(port)
+    failed = sum(isinstance(r, Exception) for r in results)
+    print(f"{label:>9}: {elapsed:6.2f}s, loop stalled up to {1e3 * await lag:7.1f} ms, "
+          f"{after['requests'] - before['requests']} requests, {failed} calls failed")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=32)
+    parser.add_argument('--latency', type=float, default=0.5)
+    parser.add_argument('--concurrency', type=int, default=4, help='LLMClient calls in flight per model')
+    parser.add_argument('--error-rate', type=float, default=0.2)
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--sync-calls', type=int, default=4, help='calls to make with the blocking client')
+    args = parser.parse_args()
+
+    server = multiprocessing.Process(target=serve, args=(args.port, args.latency, args.error_rate, 1), daemon=True)
+    server.start()
+    base_url = f'http://127.0.0.1:{args.port}/v1'
+    for _ in range(100):
+        try:
+            server_stats(args.port)
+            break
+        except OSError:
+            time.sleep(0.1)
+
+    sync = OpenAI(base_url=base_url, api_key='unused', max_retries=5)
+
+    async def blocking():
+        # What the handlers did: a synchronous call inside a coroutine
+        return sync.chat.completions.create(model=MODEL, messages=MESSAGES)
+
+    await measure('sync', lambda: [blocking() for _ in range(args.sync_calls)], args.port)
+
+    client = LLMClient(base_url, 'unused', max_retries=6, concurrency=args.concurrency, backoff=0.1)
+    peak = server_stats(args.port)['max_in_flight']
+    await measure('LLMClient', lambda: [client.complete(MODEL, messages=MESSAGES) for _ in range(args.calls)], args.port)
+    stats = client.stats()[MODEL]
+    print(f"           {stats['calls']} calls, {stats['retries']} retries, {stats['failures']} failures, "
+          f"server saw up to {max(peak, server_stats(args.port)['max_in_flight'])} at once (limit {args.concurrency})")
+    await client.close()
+    server.terminate()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,59 @@
+"""
+Size of the game-state prompt with short dense ids ('p12', 'f3') against the
+truncated UUIDs it used before, how often truncated UUIDs collide within a
+game, and a check that every short id resolves back to its province or
+faction.
+
+    PYTHONPATH=src python benchmarks/prompt_ids.py --grains 1000 5000 20000 --games 20
+"""
+import argparse
+import os
+import re
+import uuid
+
+os.environ.setdefault('OPENROUTER_KEY', 'unused')
+
+from create_game.create_game import make_game
+from llm.state_to_context import generate_game_state_yaml_manual, truncate_id, resolve_province, resolve_faction
+
+REF = re.compile(r'\b([pf])(\d+)\b')
+
+
+def with_truncated_ids(yaml: str, game_state) -> str:
+    """The same prompt with the ids the renderer used to print."""
+    ids = {'p': [p.province_id for p in game_state.provinces], 'f': [f.faction_id for f in game_state.factions]}
+    return REF.sub(lambda m: truncate_id(ids[m.group(1)][int(m.group(2))]), yaml)
+
+
+def collisions(n: int, games: int) -> int:
+    """Games out of `games` with two of n random uuid4s sharing their first group."""
+    return sum(len({truncate_id(str(uuid.uuid4())) for _ in range(n)}) < n for _ in range(games))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--grains', type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument('--players', type=int, default=6)
+    parser.add_argument('--games', type=int, default=20, help='random games per grain for the collision count')
+    args = parser.parse_args()
+
+    print(f"{'grain':>6} {'truncated chars':>16} {'short chars':>12} {'saved':>6} {'colliding games':>16}")
+    for grain in args.grains:
+        game_state = make_game('bench', args.players, grain, seed=grain)
+
+        for n, p in enumerate(game_state.provinces):
+            assert resolve_province(game_state, f"p{n}") is p
+            assert resolve_province(game_state, p.province_id) is p
+        for n, f in enumerate(game_state.factions):
+            assert resolve_faction(game_state, f"f{n}") is f
+        assert resolve_province(game_state, f"p{len(game_state.provinces)}") is None
+
+        short = generate_game_state_yaml_manual(game_state)
+        truncated = with_truncated_ids(short, game_state)
+        n_ids = len(game_state.provinces) + len(game_state.factions)
+        print(f"{grain:>6} {len(truncated):>16,} {len(short):>12,} {1 - len(short) / len(truncated):>6.1%} "
+              f"{collisions(n_ids, args.games):>9} of {args.games}")
+
+
+if __name__ == '__main__':
+    main()
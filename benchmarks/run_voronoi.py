@@ -0,0 +1,64 @@
+"""
+Times run_voronoi's vectorized region filter against the original per-vertex
+loop on the same diagram and checks both keep exactly the same regions.
+Qhull's own time is shown for scale.
+
+    PYTHONPATH=src python benchmarks/run_voronoi.py --grains 100 1000 10000 100000
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from create_game.continents import run_voronoi, filter_regions
+
+
+def filter_regions_loop(vor, bounding_box=(0., 1., 0., 1.)):
+    """The original filter."""
+    eps = sys.float_info.epsilon
+    regions = []
+    for region in vor.regions:
+        flag = True
+        for index in region:
+            if index == -1:
+                flag = False
+                break
+            else:
+                x = vor.vertices[index, 0]
+                y = vor.vertices[index, 1]
+                if not(bounding_box[0] - eps <= x and x <= bounding_box[1] + eps and
+                    bounding_box[2] - eps <= y and y <= bounding_box[3] + eps):
+                    flag = False
+                    break
+        if region != [] and flag:
+            regions.append(region)
+    return regions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--grains', type=int, nargs='+', default=[100, 1000, 10000, 100000])
+    args = parser.parse_args()
+
+    print(f"{'grain':>7} {'run_voronoi s':>14} {'filter s':>9} {'loop filter s':>14} {'regions':>8}")
+    for grain in args.grains:
+        np.random.seed(grain)
+        start = time.perf_counter()
+        vor = run_voronoi(grain=grain)
+        total = time.perf_counter() - start
+
+        start = time.perf_counter()
+        regions = filter_regions(vor, len(vor.filtered_points), np.array([0., 1., 0., 1.]))
+        vectorized = time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = filter_regions_loop(vor)
+        loop = time.perf_counter() - start
+
+        assert regions == vor.filtered_regions == expected, f"filtered regions differ at grain {grain}"
+        print(f"{grain:>7} {total:>14.3f} {vectorized:>9.3f} {loop:>14.3f} {len(expected):>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Size, encode time and decode time of the binary state codec against the
+JSON path update_game_state used (json.dumps(asdict(...), indent=2) and
+create_game_state_from_json).
+
+    PYTHONPATH=src python benchmarks/state_codec.py --grains 100 500 1000 5000 10000
+"""
+import argparse
+import json
+import os
+import time
+from dataclasses import asdict
+
+os.environ.setdefault('OPENROUTER_KEY', 'unused')
+
+from create_game.create_game import make_game
+from llm.state_to_context import create_game_state_from_json
+from storage.codec import encode_state, decode_state
+
+
+def best_of(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--grains', type=int, nargs='+', default=[100, 500, 1000, 5000, 10000])
+    parser.add_argument('--players', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'grain':>6} {'format':>7} {'bytes':>11} {'encode ms':>10} {'decode ms':>10}")
+    for grain in args.grains:
+        start = time.perf_counter()
+        gs = make_game('bench', args.players, grain)
+        print(f"{grain:>6} (map generated in {time.perf_counter() - start:.1f}s)")
+
+        json_body = json.dumps(asdict(gs), indent=2)
+        json_enc = best_of(lambda: json.dumps(asdict(gs), indent=2), args.repeat)
+        json_dec = best_of(lambda: create_game_state_from_json(json_body), args.repeat)
+
+        bin_body = encode_state(gs)
+        bin_enc = best_of(lambda: encode_state(gs), args.repeat)
+        bin_dec = best_of(lambda: decode_state(bin_body), args.repeat)
+
+        assert decode_state(bin_body) == gs
+
+        print(f"{grain:>6} {'json':>7} {len(json_body.encode()):>11,} {json_enc * 1e3:>10.1f} {json_dec * 1e3:>10.1f}")
+        print(f"{grain:>6} {'binary':>7} {len(bin_body):>11,} {bin_enc * 1e3:>10.1f} {bin_dec * 1e3:>10.1f}"
+              f"   ({len(json_body.encode()) / len(bin_body):.1f}x smaller)")
+
+
+if __name__ == '__main__':
+    main()
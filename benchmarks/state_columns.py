@@ -0,0 +1,117 @@
+"""
+Memory of the province rows as slotted dataclasses against the plain
+dataclasses they replaced, plus the StateColumns arrays, and the time of
+whole-map questions answered by looping over rows against the columns.
+
+    PYTHONPATH=src python benchmarks/state_columns.py --grains 1000 10000 20000
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from dataclasses import fields, make_dataclass
+
+import numpy as np
+
+from create_game import schema
+from create_game.create_game import make_game
+from create_game.columns import StateColumns
+
+
+def unslotted(cls):
+    return make_dataclass(cls.__name__, [(f.name, f.type, f) for f in fields(cls)])
+
+
+PLAIN = {name: unslotted(getattr(schema, name)) for name in ('City', 'Army', 'Port', 'Fort', 'Province')}
+SLOTTED = {name: getattr(schema, name) for name in PLAIN}
+
+
+def rows(provinces, classes):
+    """Rebuild the rows with `classes`. Strings and geometry are shared, neighbor lists copied."""
+    City, Army, Port, Fort, Province = (classes[n] for n in ('City', 'Army', 'Port', 'Fort', 'Province'))
+    return [
+        Province(
+            province_id=p.province_id, fractal_id=p.fractal_id, name=p.name, faction_id=p.faction_id,
+            is_ocean=p.is_ocean, border=p.border, centriod=p.centriod,
+            city=City(is_capital=p.city.is_capital) if p.city else None,
+            army=Army(faction_id=p.army.faction_id, numbers=p.army.numbers) if p.army else None,
+            fort=Fort() if p.fort else None,
+            port=Port() if p.port else None,
+            neighbors=list(p.neighbors),
+        )
+        for p in provinces
+    ]
+
+
+def allocated(build):
+    gc.collect()
+    tracemalloc.start()
+    kept = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return kept, size
+
+
+def best_of(fn, repeat: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# Row-loop answers, as the code asked them before columns
+def owned_by(provinces, fid):
+    return [i for i, p in enumerate(provinces) if p.faction_id == fid]
+
+
+def has_capital(provinces, fid):
+    return any(p.faction_id == fid and p.city and p.city.is_capital for p in provinces)
+
+
+def troops_by_faction(provinces):
+    totals = {}
+    for p in provinces:
+        if p.army:
+            totals[p.army.faction_id] = totals.get(p.army.faction_id, 0) + p.army.numbers
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--grains', type=int, nargs='+', default=[1000, 10000, 20000])
+    parser.add_argument('--players', type=int, default=8)
+    args = parser.parse_args()
+
+    for grain in args.grains:
+        gs = make_game('bench', args.players, grain, seed=grain)
+        n = len(gs.provinces)
+        fid = gs.factions[0].faction_id
+
+        _, plain = allocated(lambda: rows(gs.provinces, PLAIN))
+        _, slotted = allocated(lambda: rows(gs.provinces, SLOTTED))
+        columns, column_bytes = allocated(lambda: StateColumns(gs.provinces, gs.factions))
+        build = best_of(lambda: StateColumns(gs.provinces, gs.factions))
+
+        print(f"grain {grain}: {n} provinces")
+        print(f"  rows   plain {plain / 1e6:6.2f} MB   slotted {slotted / 1e6:6.2f} MB   "
+              f"columns {column_bytes / 1e6:5.2f} MB (built in {1e3 * build:.1f} ms)")
+
+        # Same answers both ways
+        assert np.array_equal(columns.owned_by(fid), owned_by(gs.provinces, fid))
+        assert columns.has_capital(fid) == has_capital(gs.provinces, fid)
+        assert {k: v for k, v in columns.troops_by_faction().items() if v} == troops_by_faction(gs.provinces)
+
+        print(f"  {'question':<20} {'rows ms':>9} {'columns ms':>11}")
+        for label, loop, vectorized in (
+            ('owned by faction', lambda: owned_by(gs.provinces, fid), lambda: columns.owned_by(fid)),
+            ('has capital', lambda: has_capital(gs.provinces, fid), lambda: columns.has_capital(fid)),
+            ('troops by faction', lambda: troops_by_faction(gs.provinces), columns.troops_by_faction),
+            ('total troops', lambda: sum(p.army.numbers for p in gs.provinces if p.army), columns.total_troops),
+        ):
+            print(f"  {label:<20} {1e3 * best_of(loop):>9.3f} {1e3 * best_of(vectorized):>11.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Fires concurrent end_turn messages across many games and checks that every
+turn fires exactly once (no lost turn_ended flags) while reporting throughput.
+
+    PYTHONPATH=src python benchmarks/stress_end_turn.py --games 50 --factions 8 --rounds 5
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+import uuid
+from collections import Counter
+
+# Storage round-trips are simulated, the LLM is never called
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+os.environ.setdefault('CACHE_FLUSH_INTERVAL', '0')
+os.environ.setdefault('OPENROUTER_KEY', 'unused')
+
+import server.main as server
+from create_game.schema import GameState, Faction
+from server.locks import KeyedLock
+from server.turns import TurnScheduler, TurnClaims
+from storage.backend import MemoryStorage
+from storage.cache import GameCache
+
+
+class GlobalLock(KeyedLock):
+    """Every game shares one lock, like the old module level s3_lock."""
+
+    def hold(self, key: str):
+        return super().hold('*')
+
+
+def make_state(n_factions: int) -> GameState:
+    return GameState(
+        game_id=str(uuid.uuid4()),
+        owner='stress',
+        game_over=False,
+        provinces=[],
+        continents=[],
+        factions=[
+            Faction(faction_id=str(uuid.uuid4()), name=f'f{i}', is_availale=True, is_defeated=False, turn_ended=False)
+            for i in range(n_factions)
+        ],
+    )
+
+
+async def run(args, locks: KeyedLock) -> float:
+    # A fresh cache per run, so the simulated latency covers the event log
+    # and geometry writes too
+    server.storage = MemoryStorage(latency=args.latency)
+    server.cache = GameCache(server.storage, flush_interval=0)
+    server.claims = TurnClaims(server.storage)
+    server.game_locks = locks
+
+    turns = Counter()
+
+    async def fake_end_turn(game_id: str, job):
+        gs = await server.cache.get_state(game_id)
+        assert all(f.turn_ended for f in gs.factions)
+        await asyncio.sleep(args.turn_time)
+
+        await server.cache.update_state(game_id, [{"type": "turn_reset"}])
+        turns[game_id] += 1
+
+    server.end_turn = fake_end_turn
+    server.turns = TurnScheduler(server.run_turn_job, concurrency=args.workers)
+    server.turns.start()
+
+    games = [make_state(args.factions) for _ in range(args.games)]
+    for gs in games:
+        await server.cache.set_state(gs.game_id, gs)
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        messages = [(gs.game_id, f.faction_id) for gs in games for f in gs.factions]
+        random.shuffle(messages)
+        await asyncio.gather(*[
+            server.websocket_handler(game_id, 'end_turn', {'faction_id': faction_id})
+            for game_id, faction_id in messages
+        ])
+        # Turns run on the scheduler; the next round starts once they are done
+        await server.turns.wait_idle()
+    elapsed = time.perf_counter() - start
+
+    lost = [gs.game_id for gs in games if turns[gs.game_id] != args.rounds]
+    assert not lost, f"{len(lost)} games lost an end_turn flag"
+    assert len(locks) == 0, "locks leaked"
+    await server.turns.close()
+
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--games', type=int, default=50)
+    parser.add_argument('--factions', type=int, default=8)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.002, help='simulated storage round-trip (s)')
+    parser.add_argument('--turn-time', type=float, default=0.01, help='simulated turn processing (s)')
+    parser.add_argument('--workers', type=int, default=4, help='turn scheduler workers')
+    args = parser.parse_args()
+
+    n_messages = args.games * args.factions * args.rounds
+
+    for label, locks in [('per-game lock', KeyedLock()), ('global lock', GlobalLock())]:
+        elapsed = asyncio.run(run(args, locks))
+        print(f"{label:>14}: {n_messages} end_turn messages in {elapsed:.2f}s "
+              f"({n_messages / elapsed:,.0f} msg/s), no flags lost")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+CPU spent on game state per turn, outside the model calls: every faction
+ends its turn, --advisor advisor messages arrive, then the turn is processed
+with --calls tool calls.
+
+"json" replays the original pipeline: state stored as JSON, parsed to list
+factions, parsed again to hydrate it and a third time to render the prompt,
+and written back whole. "hydrated" is the current one: the state is decoded
+once into the cache, the prompt is rendered once per change, and only the
+events are written.
+
+    PYTHONPATH=src python benchmarks/turn_cpu.py --grains 1000 5000 --advisor 10 --calls 100
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import time
+from dataclasses import asdict
+
+os.environ.setdefault('OPENROUTER_KEY', 'unused')
+
+from create_game.create_game import make_game
+from llm.end_turn_agent import apply_tool_call
+from llm.state_to_context import create_game_state_from_json, generate_game_state_yaml_manual, process
+from storage.codec import encode_state, decode_state
+from storage.event_log import apply_events
+
+from apply_turn import tool_calls, events_for
+
+
+def json_turn(body: str, calls, advisor: int) -> str:
+    # Each faction ending its turn: parse, flag, write back
+    for f in json.loads(body)['factions']:
+        data = json.loads(body)
+        for g in data['factions']:
+            if g['faction_id'] == f['faction_id']:
+                g['turn_ended'] = True
+        body = json.dumps(data)
+
+    for _ in range(advisor):
+        generate_game_state_yaml_manual(create_game_state_from_json(body))
+
+    [f['faction_id'] for f in json.loads(body)['factions']]
+    game_state = create_game_state_from_json(body)
+    generate_game_state_yaml_manual(create_game_state_from_json(body))
+    for name, args in calls:
+        apply_tool_call(name, args, game_state)
+    for f in game_state.factions:
+        f.turn_ended = False
+    body = json.dumps(asdict(game_state), indent=2)
+    generate_game_state_yaml_manual(game_state)
+    return body
+
+
+def hydrated_turn(body: bytes, calls, advisor: int):
+    # Loaded into the cache once
+    game_state = decode_state(body)
+    written = []
+
+    for f in game_state.factions:
+        events = [{"type": "turn_ended", "faction_id": f.faction_id}]
+        apply_events(game_state, events)
+        written.append(json.dumps(events))
+
+    for _ in range(advisor):
+        process(game_state)
+
+    process(game_state)
+    updates = []
+    for name, args in calls:
+        updates.extend(apply_tool_call(name, args, game_state))
+    events = events_for(updates) + [{"type": "turn_reset"}]
+    apply_events(game_state, events)
+    written.append(json.dumps(events))
+    process(game_state)
+    return written
+
+
+def cpu(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.process_time()
+        fn()
+        best = min(best, time.process_time() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--grains', type=int, nargs='+', default=[1000, 5000])
+    parser.add_argument('--players', type=int, default=6)
+    parser.add_argument('--advisor', type=int, default=10, help='advisor messages per turn')
+    parser.add_argument('--calls', type=int, default=100, help='tool calls per turn')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'grain':>6} {'json ms':>9} {'hydrated ms':>12} {'speedup':>8}")
+    for grain in args.grains:
+        base = make_game('bench', args.players, grain, seed=grain)
+        calls = tool_calls(base, args.calls, random.Random(grain))
+        body_json = json.dumps(asdict(base), indent=2)
+        body_binary = encode_state(base, version=0)
+
+        before = cpu(lambda: json_turn(body_json, copy.deepcopy(calls), args.advisor), args.repeat)
+        after = cpu(lambda: hydrated_turn(body_binary, copy.deepcopy(calls), args.advisor), args.repeat)
+        print(f"{grain:>6} {1e3 * before:>9.1f} {1e3 * after:>12.1f} {before / after:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Struct-of-arrays copy of the per-province fields that change during a game,
+so whole-map questions (who owns what, how many troops each faction has,
+whether a faction still holds a capital) are numpy reductions instead of
+loops over Province objects.
+
+Province dataclasses stay the source of truth. GameState.columns() builds
+the arrays on first use and GameState.changed() refreshes one row after a
+mutation.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, List
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from create_game.schema import Faction, Province
+
+OCEAN, CITY, CAPITAL, FORT, PORT = 1, 2, 4, 8, 16
+
+# Owner code of unowned provinces and empty armies
+NONE = -1
+
+
+class StateColumns:
+
+    __slots__ = ('provinces', 'factions', 'faction_ids', 'codes',
+                 'owner', 'army_owner', 'army', 'flags', 'neighbor_indptr', 'neighbor_indices')
+
+    def __init__(self, provinces: List[Province], factions: List[Faction]):
+        self.provinces = provinces
+        self.factions = factions
+        self.faction_ids: List[str] = [f.faction_id for f in factions]
+        self.codes: Dict[str, int] = {fid: i for i, fid in enumerate(self.faction_ids)}
+
+        n = len(provinces)
+        self.owner = np.fromiter((self.code(p.faction_id) for p in provinces), dtype=np.int16, count=n)
+        self.army_owner = np.fromiter((self.code(p.army.faction_id if p.army else None) for p in provinces),
+                                      dtype=np.int16, count=n)
+        self.army = np.fromiter((p.army.numbers if p.army else 0 for p in provinces), dtype=np.int64, count=n)
+        self.flags = np.fromiter((_flags(p) for p in provinces), dtype=np.uint8, count=n)
+
+        # Neighbors as CSR: row i is neighbor_indices[neighbor_indptr[i]:neighbor_indptr[i + 1]]
+        position = {p.province_id: i for i, p in enumerate(provinces)}
+        lengths = np.fromiter((len(p.neighbors) for p in provinces), dtype=np.int64, count=n)
+        self.neighbor_indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.neighbor_indptr[1:])
+        self.neighbor_indices = np.fromiter((position[nb] for p in provinces for nb in p.neighbors),
+                                            dtype=np.int32, count=int(self.neighbor_indptr[-1]))
+
+    def built_from(self, provinces: List[Province], factions: List[Faction]) -> bool:
+        return provinces is self.provinces and len(provinces) == len(self.owner) and factions is self.factions
+
+    def code(self, faction_id: str | None) -> int:
+        """Small integer for a faction id. Ids outside the faction list get codes past its end."""
+        if faction_id is None:
+            return NONE
+        if faction_id not in self.codes:
+            self.codes[faction_id] = len(self.faction_ids)
+            self.faction_ids.append(faction_id)
+        return self.codes[faction_id]
+
+    def refresh(self, i: int, province: Province):
+        self.owner[i] = self.code(province.faction_id)
+        self.army_owner[i] = self.code(province.army.faction_id if province.army else None)
+        self.army[i] = province.army.numbers if province.army else 0
+        self.flags[i] = _flags(province)
+
+    # -------------------- Questions --------------------
+    def owned_by(self, faction_id: str) -> np.ndarray:
+        """Positions of the provinces a faction owns, in list order."""
+        if faction_id not in self.codes:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(self.owner == self.codes[faction_id])
+
+    def has_capital(self, faction_id: str) -> bool:
+        if faction_id not in self.codes:
+            return False
+        return bool(np.any((self.owner == self.codes[faction_id]) & ((self.flags & CAPITAL) != 0)))
+
+    def province_counts(self) -> Dict[str, int]:
+        owned = self.owner[self.owner != NONE]
+        counts = np.bincount(owned, minlength=len(self.faction_ids))
+        return {fid: int(c) for fid, c in zip(self.faction_ids, counts)}
+
+    def troops_by_faction(self) -> Dict[str, int]:
+        """Army sizes summed by the faction each army belongs to."""
+        has_army = self.army_owner != NONE
+        totals = np.bincount(self.army_owner[has_army], weights=self.army[has_army], minlength=len(self.faction_ids))
+        return {fid: int(t) for fid, t in zip(self.faction_ids, totals)}
+
+    def total_troops(self) -> int:
+        return int(self.army.sum())
+
+    def neighbors_of(self, i: int) -> np.ndarray:
+        return self.neighbor_indices[self.neighbor_indptr[i]:self.neighbor_indptr[i + 1]]
+
+
+def _flags(p: Province) -> int:
+    flags = 0
+    if p.is_ocean:
+        flags |= OCEAN
+    if p.city is not None:
+        flags |= CITY | (CAPITAL if p.city.is_capital else 0)
+    if p.fort is not None:
+        flags |= FORT
+    if p.port is not None:
+        flags |= PORT
+    return flags
@@ -2,23 +2,49 @@ import matplotlib.pyplot as plt
 import numpy as np
 import scipy as sp
 import sys
+import itertools
 from shapely import Polygon
 import shapely
 import random
 import uuid
-from typing import Set, List
+from typing import Dict, Set, List, Tuple
 
 from create_game.schema import GameState, Province, Faction, \
-                               City, Army, Port, Fort, \
-                               get_province, get_province_by_fractal
+                               City, Army, Port, Fort
 from create_game.naming import name_province
 
-def run_voronoi(grain: int = 100):
-    """https://stackoverflow.com/questions/28665491/getting-a-bounded-polygon-coordinates-from-voronoi-cells"""
-
+def seeded_uuid(rng: random.Random = random) -> str:
+    """A uuid4-shaped id drawn from `rng`, so seeded maps get the same ids."""
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+def filter_regions(vor, n_center, bounding_box):
+    """
+    Keep non-empty regions whose vertices are all finite and inside the
+    box, in vor.regions order. Only cells of the first `n_center` (in box)
+    points are candidates: a mirrored point's cell contains that point,
+    which lies outside the box.
+    """
     eps = sys.float_info.epsilon
 
-    towers = np.random.rand(grain, 2)
+    x, y = vor.vertices[:, 0], vor.vertices[:, 1]
+    vertex_in_box = ((bounding_box[0] - eps <= x) & (x <= bounding_box[1] + eps) &
+                     (bounding_box[2] - eps <= y) & (y <= bounding_box[3] + eps))
+
+    candidates = [vor.regions[r] for r in np.sort(vor.point_region[:n_center])]
+    candidates = [r for r in candidates if r]
+    lengths = np.fromiter(map(len, candidates), dtype=np.int64, count=len(candidates))
+    flat = np.fromiter(itertools.chain.from_iterable(candidates), dtype=np.int64, count=int(lengths.sum()))
+
+    # -1 is the vertex at infinity
+    vertex_ok = (flat != -1) & vertex_in_box[np.where(flat == -1, 0, flat)]
+    region_ok = np.logical_and.reduceat(vertex_ok, np.cumsum(lengths) - lengths)
+
+    return [r for r, ok in zip(candidates, region_ok) if ok]
+
+def run_voronoi(grain: int = 100, rng: np.random.Generator = np.random):
+    """https://stackoverflow.com/questions/28665491/getting-a-bounded-polygon-coordinates-from-voronoi-cells"""
+
+    towers = rng.random((grain, 2))
     bounding_box = np.array([0., 1., 0., 1.]) # [x_min, x_max, y_min, y_max]
 
     def in_box(towers, bounding_box):
@@ -27,7 +53,6 @@ def run_voronoi(grain: int = 100):
                             np.logical_and(bounding_box[2] <= towers[:, 1],
                                             towers[:, 1] <= bounding_box[3]))
 
-
     def voronoi(towers, bounding_box):
         # Select towers inside the bounding box
         i = in_box(towers, bounding_box)
@@ -52,105 +77,187 @@ def run_voronoi(grain: int = 100):
                         axis=0)
         # Compute Voronoi
         vor = sp.spatial.Voronoi(points)
-        # Filter regions
-        regions = []
-        for region in vor.regions:
-            flag = True
-            for index in region:
-                if index == -1:
-                    flag = False
-                    break
-                else:
-                    x = vor.vertices[index, 0]
-                    y = vor.vertices[index, 1]
-                    if not(bounding_box[0] - eps <= x and x <= bounding_box[1] + eps and
-                        bounding_box[2] - eps <= y and y <= bounding_box[3] + eps):
-                        flag = False
-                        break
-            if region != [] and flag:
-                regions.append(region)
         vor.filtered_points = points_center
-        vor.filtered_regions = regions
+        vor.filtered_regions = filter_regions(vor, len(points_center), bounding_box)
         return vor
 
     vor = voronoi(towers, bounding_box)
 
     return vor
 
-def find_neighbors(regions, vertices) -> np.ndarray:
+def find_neighbors(regions, vertices, rng: random.Random = random) -> Tuple[sp.sparse.csr_matrix, List[Province]]:
+  """
+  Two regions are neighbors when they share a Voronoi ridge, i.e. an edge.
+  Every region edge is keyed by its (sorted) vertex pair; an edge that shows
+  up twice is a ridge between the two regions it came from. Regions that
+  only touch at a corner are not neighbors.
+
+  Returns a symmetric CSR adjacency matrix, row i holding region i's neighbors.
+  """
 
-  adjacency_matrix = np.zeros((len(regions), len(regions)))
+  n = len(regions)
 
   beta_provinces = [
       Province(
-          province_id=str(uuid.uuid4()),
+          province_id=seeded_uuid(rng),
           fractal_id='-'.join([str(f) for f in r]),
           name=None,
           border=vertices[r + [r[0]], :].tolist(),
           centriod=vertices[r].mean(axis=0).tolist()
       ) for r in regions]
 
-  for i1, r1 in enumerate(regions):
+  # Flatten every region's vertex loop, remembering which region each came from
+  lengths = np.fromiter((len(r) for r in regions), dtype=np.int64, count=n)
+  flat = np.fromiter((v for r in regions for v in r), dtype=np.int64, count=int(lengths.sum()))
+  region_of = np.repeat(np.arange(n), lengths)
 
-    for i2, r2 in enumerate(regions):
+  # Edge j runs from vertex j to the next one around its region, wrapping at the end
+  starts = np.cumsum(lengths) - lengths
+  nxt = np.arange(len(flat)) + 1
+  nxt[starts + lengths - 1] = starts
 
-      if r1 == r2:
-        continue
+  a, b = flat, flat[nxt]
+  edge = np.minimum(a, b) * len(vertices) + np.maximum(a, b)
 
-      if len(set(r1) & set(r2)) > 0:
+  order = np.argsort(edge, kind='stable')
+  edge = edge[order]
+  shared = np.flatnonzero(edge[1:] == edge[:-1])
+  r1 = region_of[order[shared]]
+  r2 = region_of[order[shared + 1]]
 
-        adjacency_matrix[i1, i2] = 1.0
+  adjacency_matrix = sp.sparse.coo_matrix(
+      (np.ones(2 * len(r1)), (np.concatenate([r1, r2]), np.concatenate([r2, r1]))),
+      shape=(n, n),
+  ).tocsr()
+  adjacency_matrix.data[:] = 1.0
 
-        beta_provinces[i1].neighbors.append(beta_provinces[i2].province_id)
+  indptr, indices = adjacency_matrix.indptr, adjacency_matrix.indices
+  for i, p in enumerate(beta_provinces):
+    p.neighbors = [beta_provinces[j].province_id for j in indices[indptr[i]:indptr[i + 1]]]
 
   return adjacency_matrix, beta_provinces
 
 # adj, beta_provinces = find_neighbors(vor.filtered_regions, vor.vertices)
 
-def get_seeds(adj: np.array, n: int = 6, percent_connection_min: float = 0.02):
-
-  continents = {}
+def get_seeds(adj: sp.sparse.csr_matrix, n: int = 6, min_degree: int = 5, rng: random.Random = random):
+  """
+  Picks `n` distinct starting tiles with at least `min_degree` neighbors,
+  which keeps seeds off the map edge. Returns {continent_id: [tile]}.
+  """
 
-  retries: int = 0
+  degree = np.diff(adj.indptr)
+  candidates = np.flatnonzero(degree >= min_degree).tolist()
 
-  while len(continents) < n:
+  if len(candidates) < n:
+    # Tiny maps, settle for whatever tiles there are
+    candidates = list(range(adj.shape[0]))
 
-    if retries > n * 2:
-      break
+  return {seeded_uuid(rng): [rn] for rn in rng.sample(candidates, min(n, len(candidates)))}
 
-    rn = random.choice(range(adj.shape[0]))
+# seeds = get_seeds(adj)
 
-    row = adj[rn]
+def expand_continents(adj: sp.sparse.csr_matrix, continents, rounds: int = 20, land_fraction: float | None = None,
+                      rng: random.Random = random):
+  """
+  Grows every continent from its seed with a randomized multi-source flood
+  fill. Each continent keeps a frontier of tiles next to it; factions take
+  turns claiming a random frontier tile, and a tile belongs to whichever
+  continent claims it first, so continents never overlap.
+
+  With `land_fraction`, continents grow until that share of the map is
+  land. Without it they cover as many tiles as the original growth did in
+  `rounds` rounds (see _original_land), so default maps keep their mix of
+  land and ocean. A continent whose frontier runs dry stops early. Every
+  tile is claimed once and every edge looked at at most twice, so the fill
+  is O(edges).
+  """
+
+  indptr = adj.indptr.tolist()
+  indices = adj.indices.tolist()
+  owned = [False] * adj.shape[0]
+
+  keys = list(continents)
+  frontiers = {}
+  for key in keys:
+    for t in continents[key]:
+      owned[t] = True
+  for key in keys:
+    frontiers[key] = [n for t in continents[key] for n in indices[indptr[t]:indptr[t + 1]] if not owned[n]]
+
+  if land_fraction is not None:
+    land = int(land_fraction * adj.shape[0])
+  else:
+    land = _original_land(indptr, indices, continents, rounds, rng)
+  target = land - sum(len(tls) for tls in continents.values())
+
+  active = [key for key in keys if frontiers[key]]
+  while active and target > 0:
+    still_active = []
+    for key in active:
+      frontier = frontiers[key]
+
+      # Pop a random frontier tile, skipping ones another continent got first
+      t = None
+      while frontier:
+        i = rng.randrange(len(frontier))
+        frontier[i], frontier[-1] = frontier[-1], frontier[i]
+        candidate = frontier.pop()
+        if not owned[candidate]:
+          t = candidate
+          break
+      if t is None:
+        continue
 
-    if adj.shape[0] * percent_connection_min >= row.sum():
-      # this one isnt good enough
-      retries += 1
-      continue
+      owned[t] = True
+      continents[key].append(t)
+      frontier.extend(n for n in indices[indptr[t]:indptr[t + 1]] if not owned[n])
+      target -= 1
 
-    continents[str(uuid.uuid4())] = [rn]
+      if target <= 0:
+        break
+      if frontier:
+        still_active.append(key)
+    active = still_active
 
   return continents
 
-# seeds = get_seeds(adj)
-
-def expand_continents(adj: np.array, continents, rounds: int = 20):
-
+def _original_land(indptr: List[int], indices: List[int], continents, rounds: int, rng: random.Random) -> int:
+  """
+  Tiles the original growth covered: each round every continent added a
+  random neighbor of a random tile it had, repeats and overlaps included,
+  so far fewer than `rounds` distinct tiles each.
+  """
+  tiles = {key: list(tls) for key, tls in continents.items()}
   for _ in range(rounds):
-    for key, tls in continents.items():
+    for tls in tiles.values():
+      t = rng.choice(tls)
+      if indptr[t] < indptr[t + 1]:
+        tls.append(rng.choice(indices[indptr[t]:indptr[t + 1]]))
+  return len({t for tls in tiles.values() for t in tls})
 
-      t = random.choice(tls)
-
-      next_possible = np.argwhere(adj[t] == 1.0)
+# continents = expand_continents(adj, seeds)
 
-      nxt = random.choice(next_possible[:, -1].tolist())
+def tile_polygons(vor, tiles: List[int]) -> np.ndarray:
+    """Closed polygons for the given filtered regions, built in one shapely call."""
 
-      tls.append(nxt)
+    regions = [vor.filtered_regions[t] for t in tiles]
+    lengths = np.fromiter(map(len, regions), dtype=np.int64, count=len(regions))
 
-  return continents
+    # Close every ring by repeating its first vertex
+    closed = np.fromiter(
+        itertools.chain.from_iterable(r + [r[0]] for r in regions),
+        dtype=np.int64, count=int(lengths.sum()) + len(regions),
+    )
+    rings = shapely.linearrings(vor.vertices[closed], indices=np.repeat(np.arange(len(regions)), lengths + 1))
 
-# continents = expand_continents(adj, seeds)
+    return shapely.polygons(rings)
 
-def join_continents(continents, provinces, vor):
+def join_continents(continents, provinces, vor, rng: random.Random = random):
+    """
+    Claims each continent's tiles (first come, first served), names them and
+    merges their cells into one polygon. `provinces` is in filtered region
+    order, as returned by find_neighbors, so tile t is provinces[t].
+    """
 
     used_tiles: Set[int] = set()
     continent_polygons = {}
@@ -167,55 +274,32 @@ def join_continents(continents, provinces, vor):
                 approved_tiles.append(t)
         
         # Use set() to avoid duplicates *within* this continent
-        approved_tiles_unique = set(approved_tiles)
+        approved_tiles_unique = list(set(approved_tiles))
         
         # Add these tiles to the global 'used' set
-        [used_tiles.add(at) for at in approved_tiles_unique]
-
-        p = None # This is our polygon accumulator
-
-        for t in approved_tiles_unique: # Loop over the unique tiles
-            try:
-                # 1. Get the region indices
-                region = vor.filtered_regions[t]
-                
-                # 2. Get vertices, *closing the polygon*
-                #    (This matches the logic from your plotting code)
-                vertices = vor.vertices[region + [region[0]], :]
-                
-                # 3. Create the individual tile polygon
-                tile_polygon = Polygon(vertices)
-
-                pv = get_province_by_fractal(provinces, '-'.join([str(f) for f in region]))
-
-                pv.name = name_province()
-                pv.is_ocean = False
-                pv.faction_id = key
-
-                civilizations[key].append(pv)
-
-                # --- THIS IS THE MAIN FIX ---
-                # 4. Correctly accumulate the polygons
-                if p is None:
-                    p = tile_polygon  # Initialize p with the *first* polygon
-                else:
-                    # Union p with the *next* polygon
-                    p = shapely.coverage_union(p, tile_polygon).normalize()
-                # ------------------------------
-
-            except shapely.GEOSException as e:
-                # It's still possible for errors, so keeping the try/except is smart
-                print(f"Warning: GEOSException on tile {t}. Skipping. Error: {e}")
-                pass
-            except Exception as e:
-                # Catch other potential errors
-                print(f"Warning: General error on tile {t}. Skipping. Error: {e}")
-                pass
-
-        continent_polygons[key] = p
-
-    # Make non continents ocean
-    ocean_tiles = list(set())
+        used_tiles.update(approved_tiles_unique)
+
+        for t in approved_tiles_unique:
+
+            pv = provinces[t]
+
+            pv.name = name_province(rng)
+            pv.is_ocean = False
+            pv.faction_id = key
+
+            civilizations[key].append(pv)
+
+        polygons = tile_polygons(vor, approved_tiles_unique)
+
+        # Voronoi cells only share whole edges, so they form a valid coverage
+        # and can be merged without the overlay machinery of a general union
+        try:
+            p = shapely.coverage_union_all(polygons)
+        except shapely.GEOSException as e:
+            print(f"Warning: GEOSException on coverage union for {key}, falling back to union_all. Error: {e}")
+            p = shapely.union_all(polygons)
+
+        continent_polygons[key] = p.normalize()
 
     return continent_polygons, provinces, civilizations
 
@@ -223,29 +307,32 @@ def join_continents(continents, provinces, vor):
 # continent_polygons, provinces, civilizations = join_continents(continents, beta_provinces)
 
 # Make cities
-def add_port(pv: Province, provinces: List[Province], p: float = 0.5) -> bool:
+def add_port(pv: Province, by_id: Dict[str, Province], p: float = 0.5, rng: random.Random = random) -> bool:
 
   # Randomly dont check
-  if not random.uniform(0, 1) > p:
+  if not rng.uniform(0, 1) > p:
 
     return False
 
   for n in pv.neighbors:
 
-    if get_province(provinces, n).is_ocean:
+    if by_id[n].is_ocean:
 
       return True
 
   return False
 
-def make_cities(civilizations, provinces, city_percent: float = 0.3, army_percent: float = 0.2) -> None:
+def make_cities(civilizations, provinces, city_percent: float = 0.3, army_percent: float = 0.2,
+                rng: random.Random = random) -> None:
+
+  by_id = {p.province_id: p for p in provinces}
 
   for civ, pvs in civilizations.items():
 
     if not pvs:
       continue
 
-    random.shuffle(pvs)
+    rng.shuffle(pvs)
 
     # Make Capital
     capital = City(
@@ -254,7 +341,7 @@ def make_cities(civilizations, provinces, city_percent: float = 0.3, army_percen
 
     pvs[0].city = capital
 
-    if add_port(pvs[0], provinces):
+    if add_port(pvs[0], by_id, rng=rng):
       pvs[0].port = Port()
 
     for i in range(1, int(len(pvs) * city_percent)):
@@ -263,10 +350,10 @@ def make_cities(civilizations, provinces, city_percent: float = 0.3, army_percen
           is_capital=False,
       )
 
-      if add_port(pvs[i], provinces):
+      if add_port(pvs[i], by_id, rng=rng):
         pvs[i].port = Port()
 
-    random.shuffle(pvs)
+    rng.shuffle(pvs)
 
     for pv in pvs[:int(len(pvs) * army_percent)]:
 
@@ -274,7 +361,7 @@ def make_cities(civilizations, provinces, city_percent: float = 0.3, army_percen
 
       pv.army = Army(
           faction_id=pv.faction_id,
-          numbers=random.choice([50, 100, 150, 200])
+          numbers=rng.choice([50, 100, 150, 200])
       )
 
 # make_cities(civilizations, provinces)
\ No newline at end of file
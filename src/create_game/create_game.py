@@ -1,26 +1,44 @@
-from create_game.schema import GameState, Faction
+from create_game.schema import GameState, Faction, MapSpec
 from create_game.continents import run_voronoi, find_neighbors, get_seeds, \
                                    expand_continents, join_continents, \
                                    make_cities
 from create_game.naming import name_faction
 
+import random
+import secrets
 import uuid
 import numpy as np
 
-def make_game(owner: str, n_players: int, grain: int = 100) -> GameState:
+# Must match MapSpec.generator_version for regenerate_map to trust a seed
+GENERATOR_VERSION = 2
 
-    vor = run_voronoi(grain=grain)
+def make_game(owner: str, n_players: int, grain: int = 100, land_fraction: float | None = None,
+              seed: int | None = None) -> GameState:
+    """
+    The same seed and parameters always give the same map, ids included.
+    Only game_id is drawn fresh, so one map can back several games.
+    """
 
-    adj, beta_provinces = find_neighbors(vor.filtered_regions, vor.vertices)
+    if seed is None:
+        seed = secrets.randbits(63)
 
-    seeds = get_seeds(adj, n=n_players)
+    # Every random draw comes from these two, never from global state
+    np_rng = np.random.default_rng(seed)
+    rng = random.Random(seed)
 
-    continents = expand_continents(adj, seeds)
+    vor = run_voronoi(grain=grain, rng=np_rng)
 
-    continent_polygons, provinces, civilizations = join_continents(continents, beta_provinces, vor)
+    adj, beta_provinces = find_neighbors(vor.filtered_regions, vor.vertices, rng=rng)
+
+    seeds = get_seeds(adj, n=n_players, rng=rng)
+
+    # Without a land fraction the map has as much land as the original growth gave it
+    continents = expand_continents(adj, seeds, land_fraction=land_fraction, rng=rng)
+
+    continent_polygons, provinces, civilizations = join_continents(continents, beta_provinces, vor, rng=rng)
 
     # Returns None, inplace edits
-    make_cities(civilizations, provinces)
+    make_cities(civilizations, provinces, rng=rng)
 
     background_polys = []
     
@@ -36,7 +54,7 @@ def make_game(owner: str, n_players: int, grain: int = 100) -> GameState:
     factions = [
         Faction(
             faction_id=c,
-            name=name_faction(),
+            name=name_faction(rng),
 
             is_availale=True,
             is_defeated=False,
@@ -50,5 +68,20 @@ def make_game(owner: str, n_players: int, grain: int = 100) -> GameState:
         game_over=False,
         provinces=provinces,
         continents=background_polys,
-        factions=factions
-    )
\ No newline at end of file
+        factions=factions,
+        map_spec=MapSpec(
+            seed=seed,
+            grain=grain,
+            n_players=n_players,
+            land_fraction=land_fraction,
+            generator_version=GENERATOR_VERSION,
+        ),
+    )
+
+def regenerate_map(spec: MapSpec, owner: str = '') -> GameState:
+    """Rebuild a map, as it was before any turns, from its spec."""
+
+    if spec.generator_version != GENERATOR_VERSION:
+        raise ValueError(f"Map was made by generator {spec.generator_version}, this is {GENERATOR_VERSION}")
+
+    return make_game(owner, spec.n_players, spec.grain, spec.land_fraction, spec.seed)
\ No newline at end of file
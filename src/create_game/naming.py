@@ -13,10 +13,10 @@ with open('fantasy_lastNames.txt', 'r') as fln:
 
 combined = male_names + last_names
 
-def name_province() -> str:
+def name_province(rng: random.Random = random) -> str:
 
-    return random.choice(combined)
+    return rng.choice(combined)
 
-def name_faction() -> str:
+def name_faction(rng: random.Random = random) -> str:
 
-    return f'The {random.choice(combined)} {random.choice(combined)}'
\ No newline at end of file
+    return f'The {rng.choice(combined)} {rng.choice(combined)}'
\ No newline at end of file
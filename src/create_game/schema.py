@@ -1,24 +1,71 @@
-from dataclasses import dataclass, field
-from typing import List
-
-@dataclass
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, Generic, List, TypeVar
+
+from create_game.columns import StateColumns
+
+T = TypeVar('T')
+
+class ListIndex(Generic[T]):
+    """
+    Position of every item of a list by one of its attributes.
+
+    Built on first use and rebuilt when the list is swapped or resized. A
+    lookup that misses, or finds an item whose key no longer matches,
+    rebuilds once before giving up, so items replaced in place are picked up
+    too. Ids are stable once a game exists, so that only happens on
+    lookups of unknown ids.
+    """
+
+    def __init__(self, attr: str):
+        self.attr = attr
+        self.items: List[T] | None = None
+        self.size = 0
+        self.positions: Dict[str, int] = {}
+
+    def _build(self, items: List[T]):
+        self.items = items
+        self.size = len(items)
+        self.positions = {getattr(item, self.attr): i for i, item in enumerate(items)}
+
+    def _find(self, items: List[T], key: str) -> int | None:
+        i = self.positions.get(key)
+        if i is not None and i < len(items) and getattr(items[i], self.attr) == key:
+            return i
+        return None
+
+    def position(self, items: List[T], key: str) -> int | None:
+        if items is not self.items or len(items) != self.size:
+            self._build(items)
+            return self._find(items, key)
+
+        i = self._find(items, key)
+        if i is None:
+            self._build(items)
+            i = self._find(items, key)
+        return i
+
+    def get(self, items: List[T], key: str) -> T | None:
+        i = self.position(items, key)
+        return items[i] if i is not None else None
+
+@dataclass(slots=True)
 class City:
     is_capital: bool
 
-@dataclass
+@dataclass(slots=True)
 class Army:
     faction_id: str
     numbers: int
 
-@dataclass
+@dataclass(slots=True)
 class Port:
     pass
 
-@dataclass
+@dataclass(slots=True)
 class Fort:
     pass
 
-@dataclass
+@dataclass(slots=True)
 class Faction:
     faction_id: str
     name: str
@@ -27,7 +74,7 @@ class Faction:
     is_defeated: bool
     turn_ended: bool
 
-@dataclass
+@dataclass(slots=True)
 class Province:
 
     # Init all as undefined then mature
@@ -52,6 +99,17 @@ class Province:
     # List of ids
     neighbors: List[str] = field(default_factory=list)
 
+@dataclass(slots=True)
+class MapSpec:
+    # Everything make_game needs to rebuild a map exactly
+    seed: int
+    grain: int
+    n_players: int
+    land_fraction: float | None = None
+
+    # Bumped whenever a generator change would turn the same seed into a different map
+    generator_version: int = 1
+
 @dataclass
 class GameState:
     
@@ -64,6 +122,71 @@ class GameState:
     continents: List[List[List[float]]]
     factions: List[Faction]
 
+    # Bumped on every persisted write, used for compare-and-swap
+    version: int = 0
+
+    # How the map was generated, None for games from before seeded generation
+    map_spec: MapSpec | None = None
+
+    # sha256 of the immutable geometry blob (storage.geometry), set once stored
+    geometry_hash: str | None = None
+
+    def __post_init__(self):
+        # Not fields, so asdict, the codec and equality never see them
+        self._province_index: ListIndex[Province] = ListIndex('province_id')
+        self._faction_index: ListIndex[Faction] = ListIndex('faction_id')
+        self._columns: StateColumns | None = None
+        self._derived: Dict[str, Any] = {}
+
+    def province(self, province_id: str) -> Province | None:
+        return self._province_index.get(self.provinces, province_id)
+
+    def faction(self, faction_id: str) -> Faction | None:
+        return self._faction_index.get(self.factions, faction_id)
+
+    # A province's or faction's dense id is its position in the list. Lists
+    # never reorder once a game exists, so the numbers are stable for its life
+    def province_number(self, province_id: str) -> int | None:
+        return self._province_index.position(self.provinces, province_id)
+
+    def faction_number(self, faction_id: str) -> int | None:
+        return self._faction_index.position(self.factions, faction_id)
+
+    def columns(self) -> StateColumns:
+        """Array view of the provinces, for questions about the whole map."""
+        if self._columns is None or not self._columns.built_from(self.provinces, self.factions):
+            self._columns = StateColumns(self.provinces, self.factions)
+        return self._columns
+
+    def derived(self, key: str, build: Callable[['GameState'], T]) -> T:
+        """build(self), kept until the next changed(). For views rendered from the whole state."""
+        if key not in self._derived:
+            self._derived[key] = build(self)
+        return self._derived[key]
+
+    def working_copy(self) -> 'GameState':
+        """
+        Copy whose provinces, armies and factions can be changed without
+        touching this state. Borders, neighbors and buildings are shared.
+        """
+        return replace(
+            self,
+            provinces=[replace(p, army=replace(p.army) if p.army else None) for p in self.provinces],
+            factions=[replace(f) for f in self.factions],
+        )
+
+    def changed(self, province: Province | None = None):
+        """
+        Call after changing the state so derived() values and columns() stay
+        current. Pass the province when its owner, army or buildings changed.
+        """
+        self._derived.clear()
+        if province is not None and self._columns is not None:
+            i = self._province_index.position(self.provinces, province.province_id)
+            if i is not None:
+                self._columns.refresh(i, province)
+
+# Linear scans for bare lists, a GameState looks ids up with province() and faction()
 def get_province(provinces: List[Province], province_id: str) -> Province | None:
 
     for p in provinces:
@@ -72,8 +195,6 @@ def get_province(provinces: List[Province], province_id: str) -> Province | None
 
             return p
 
-    print(province_id, [p.province_id for p in provinces])
-        
     return None
 
 def get_faction(factions: List[Faction], faction_id: str) -> Faction | None:
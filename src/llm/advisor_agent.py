@@ -1,8 +1,8 @@
 from llm.client import client
 
-def get_advice(faction_id, context, state, scratch_pad, message) -> str:
+async def get_advice(faction_id, context, state, scratch_pad, message) -> str:
 
-    completion = client.chat.completions.create(
+    completion = await client.complete(
         model="google/gemini-2.5-pro",
         messages=[
                     {
@@ -27,9 +27,9 @@ def get_advice(faction_id, context, state, scratch_pad, message) -> str:
 
     return completion.choices[0].message.content
 
-def update_scratch_pad(faction_id, context, state, scratch_pad, message) -> str:
+async def update_scratch_pad(faction_id, context, state, scratch_pad, message) -> str:
 
-    completion = client.chat.completions.create(
+    completion = await client.complete(
         model="google/gemini-2.5-pro",
         messages=[
                     {
@@ -1,9 +1,140 @@
-from openai import OpenAI
-import os, dotenv
+import asyncio
+import os
+import random
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict
+
+import dotenv
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, APITimeoutError
 
 dotenv.load_dotenv()
 
-client = OpenAI(
-  base_url="https://openrouter.ai/api/v1",
-  api_key=os.getenv("OPENROUTER_KEY"),
-)
\ No newline at end of file
+
+@dataclass
+class ModelStats:
+    calls: int = 0
+    retries: int = 0
+    failures: int = 0
+    in_flight: int = 0
+    waiting: int = 0
+    seconds_total: float = 0.0
+
+
+def parse_limits(spec: str) -> Dict[str, int]:
+    """'google/gemini-2.5-pro=4,gpt-4o=8' -> {'google/gemini-2.5-pro': 4, 'gpt-4o': 8}"""
+    limits = {}
+    for part in spec.split(','):
+        if part.strip():
+            model, limit = part.strip().rsplit('=', 1)
+            limits[model] = int(limit)
+    return limits
+
+
+def _retryable(e: Exception) -> bool:
+    if isinstance(e, (APIConnectionError, APITimeoutError)):
+        return True
+    return isinstance(e, APIStatusError) and (e.status_code == 429 or e.status_code >= 500)
+
+
+def _retry_after(e: Exception) -> float | None:
+    response = getattr(e, 'response', None)
+    try:
+        return float(response.headers['retry-after'])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+
+class LLMClient:
+    """
+    One AsyncOpenAI client, and so one pooled set of connections, shared by
+    every agent.
+
+    At most `concurrency` calls per model are in flight (`model_concurrency`
+    overrides it per model), the rest wait their turn. Each attempt is cut
+    off after `timeout` seconds. Rate limits (429), server errors (5xx),
+    timeouts and dropped connections are retried up to `max_retries` times
+    with full-jitter exponential backoff, honoring Retry-After, and without
+    holding a slot while waiting.
+    """
+
+    def __init__(self, base_url: str, api_key: str | None, timeout: float = 120.0, max_retries: int = 4,
+                 concurrency: int = 8, model_concurrency: Dict[str, int] | None = None,
+                 backoff: float = 1.0, max_backoff: float = 30.0):
+        # Retries are ours, so the SDK makes a single attempt
+        self.openai = AsyncOpenAI(base_url=base_url, api_key=api_key or 'unset', timeout=timeout, max_retries=0)
+        self.max_retries = max_retries
+        self.concurrency = concurrency
+        self.model_concurrency = model_concurrency or {}
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.stats_by_model: Dict[str, ModelStats] = defaultdict(ModelStats)
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        if model not in self.semaphores:
+            self.semaphores[model] = asyncio.Semaphore(self.model_concurrency.get(model, self.concurrency))
+        return self.semaphores[model]
+
+    async def complete(self, model: str, **kwargs):
+        """chat.completions.create(model=model, **kwargs), limited and retried."""
+        stats = self.stats_by_model[model]
+        semaphore = self._semaphore(model)
+        loop = asyncio.get_running_loop()
+
+        for attempt in range(self.max_retries + 1):
+            stats.waiting += 1
+            async with semaphore:
+                stats.waiting -= 1
+                stats.in_flight += 1
+                start = loop.time()
+                try:
+                    completion = await self.openai.chat.completions.create(model=model, **kwargs)
+                except Exception as e:
+                    if not _retryable(e) or attempt == self.max_retries:
+                        stats.failures += 1
+                        raise
+                    error = e
+                else:
+                    stats.calls += 1
+                    return completion
+                finally:
+                    stats.in_flight -= 1
+                    stats.seconds_total += loop.time() - start
+
+            stats.retries += 1
+            delay = _retry_after(error)
+            if delay is None:
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+            print(f"[WARN] {model} call failed ({error!r}), retry {attempt + 1} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def close(self):
+        await self.openai.close()
+
+    def stats(self) -> Dict[str, Dict]:
+        return {
+            model: {
+                "calls": s.calls,
+                "retries": s.retries,
+                "failures": s.failures,
+                "in_flight": s.in_flight,
+                "waiting": s.waiting,
+                "limit": self.model_concurrency.get(model, self.concurrency),
+                "avg_seconds": s.seconds_total / (s.calls + s.retries + s.failures) if s.calls + s.retries + s.failures else 0.0,
+            }
+            for model, s in self.stats_by_model.items()
+        }
+
+
+# LLM_CONCURRENCY caps calls in flight per model, LLM_MODEL_CONCURRENCY
+# overrides it per model, e.g. "google/gemini-2.5-pro=4,gpt-4o=8"
+client = LLMClient(
+    base_url=os.getenv('LLM_BASE_URL', 'https://openrouter.ai/api/v1'),
+    api_key=os.getenv("OPENROUTER_KEY"),
+    timeout=float(os.getenv('LLM_TIMEOUT', '120')),
+    max_retries=int(os.getenv('LLM_MAX_RETRIES', '4')),
+    concurrency=int(os.getenv('LLM_CONCURRENCY', '8')),
+    model_concurrency=parse_limits(os.getenv('LLM_MODEL_CONCURRENCY', '')),
+)
@@ -1,8 +1,8 @@
 from llm.client import client
 
-def generate_context(game_state_yaml: str) -> str:
+async def generate_context(game_state_yaml: str) -> str:
 
-    completion = client.chat.completions.create(
+    completion = await client.complete(
         model="google/gemini-2.5-pro",
         messages=[
                     {
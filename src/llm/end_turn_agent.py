@@ -5,7 +5,9 @@ from llm.client import client
 
 import json
 
-from create_game.schema import GameState, get_province, Army, get_faction
+from create_game.schema import GameState, Army
+from llm.state_to_context import resolve_province, resolve_faction
+from storage.cache import GameCache
 
 
 # ==========================================================
@@ -26,14 +28,16 @@ def apply_tool_call(tool_name: str, args: dict, game_state: GameState):
         # Add to Army
         # --------------------------------------------------
         case "add_to_army":
-            p = get_province(game_state.provinces, args["province_id"])
+            p = resolve_province(game_state, args["province_id"])
             if not p:
                 return updates
 
             if p.army is None:
-                p.army = Army(faction_id=args.get("faction_id", p.faction_id), numbers=args["number"])
+                faction = resolve_faction(game_state, args["faction_id"]) if args.get("faction_id") else None
+                p.army = Army(faction_id=faction.faction_id if faction else p.faction_id, numbers=args["number"])
             else:
                 p.army.numbers += args["number"]
+            game_state.changed(p)
 
             updates.append({
                 "type": "province",
@@ -45,13 +49,14 @@ def apply_tool_call(tool_name: str, args: dict, game_state: GameState):
         # Subtract from Army
         # --------------------------------------------------
         case "subtract_from_army":
-            p = get_province(game_state.provinces, args["province_id"])
+            p = resolve_province(game_state, args["province_id"])
             if not p or not p.army:
                 return updates
 
             p.army.numbers -= args["number"]
             if p.army.numbers <= 0:
                 p.army = None  # army destroyed
+            game_state.changed(p)
 
             updates.append({
                 "type": "province",
@@ -63,13 +68,15 @@ def apply_tool_call(tool_name: str, args: dict, game_state: GameState):
         # Capture Province
         # --------------------------------------------------
         case "capture_province":
-            province = get_province(game_state.provinces, args["province_id"])
-            if not province:
+            province = resolve_province(game_state, args["province_id"])
+            new_faction = resolve_faction(game_state, args["faction_id"])
+            if not province or not new_faction:
                 return updates
 
             old_faction_id = province.faction_id
-            new_faction_id = args["faction_id"]
+            new_faction_id = new_faction.faction_id
             province.faction_id = new_faction_id
+            game_state.changed(province)
 
             updates.append({
                 "type": "province",
@@ -80,28 +87,27 @@ def apply_tool_call(tool_name: str, args: dict, game_state: GameState):
             if not old_faction_id:
                 return updates
 
-            old_faction = get_faction(game_state.factions, old_faction_id)
+            old_faction = game_state.faction(old_faction_id)
             if not old_faction:
                 return updates
 
             # check if old faction still has a capital
-            capital_captured = True
-            for p in game_state.provinces:
-                if p.faction_id == old_faction_id and p.city and p.city.is_capital:
-                    capital_captured = False
-                    break
+            columns = game_state.columns()
+            capital_captured = not columns.has_capital(old_faction_id)
 
             if capital_captured:
                 # transfer all provinces of the defeated faction
-                for p in game_state.provinces:
-                    if p.faction_id == old_faction_id:
-                        p.faction_id = new_faction_id
-                        updates.append({
-                            "type": "province",
-                            "id": p.province_id,
-                            "data": p
-                        })
+                for i in columns.owned_by(old_faction_id):
+                    p = game_state.provinces[i]
+                    p.faction_id = new_faction_id
+                    game_state.changed(p)
+                    updates.append({
+                        "type": "province",
+                        "id": p.province_id,
+                        "data": p
+                    })
                 old_faction.is_defeated = True
+                game_state.changed()
                 updates.append({
                     "type": "faction",
                     "id": old_faction.faction_id,
@@ -119,8 +125,8 @@ def apply_tool_call(tool_name: str, args: dict, game_state: GameState):
 # TURN PROCESSING
 # ==========================================================
 
-def process_turn_end(context: str, game_state_yaml: str, advisor_pads: List[str], game_state: GameState):
-    completion = client.chat.completions.create(
+async def process_turn_end(context: str, game_state_yaml: str, advisor_pads: List[str], game_state: GameState):
+    completion = await client.complete(
         model="gpt-4o",
         messages=[
             {
@@ -154,9 +160,9 @@ Favor balance: assist smaller factions slightly, but remain fair.
                     "parameters": {
                         "type": "object",
                         "properties": {
-                            "province_id": {"type": "string"},
+                            "province_id": {"type": "string", "description": "Province id from the game state, e.g. p12"},
                             "number": {"type": "integer"},
-                            "faction_id": {"type": "string"}
+                            "faction_id": {"type": "string", "description": "Faction id from the game state, e.g. f3"}
                         },
                         "required": ["province_id", "number"]
                     }
@@ -170,7 +176,7 @@ Favor balance: assist smaller factions slightly, but remain fair.
                     "parameters": {
                         "type": "object",
                         "properties": {
-                            "province_id": {"type": "string"},
+                            "province_id": {"type": "string", "description": "Province id from the game state, e.g. p12"},
                             "number": {"type": "integer"}
                         },
                         "required": ["province_id", "number"]
@@ -185,8 +191,8 @@ Favor balance: assist smaller factions slightly, but remain fair.
                     "parameters": {
                         "type": "object",
                         "properties": {
-                            "province_id": {"type": "string"},
-                            "faction_id": {"type": "string"}
+                            "province_id": {"type": "string", "description": "Province id from the game state, e.g. p12"},
+                            "faction_id": {"type": "string", "description": "Faction id from the game state, e.g. f3"}
                         },
                         "required": ["province_id", "faction_id"]
                     }
@@ -198,6 +204,11 @@ Favor balance: assist smaller factions slightly, but remain fair.
     choice = completion.choices[0].message
     updates = []
 
+    # Tool calls change a copy, the cached state only changes through the
+    # events update_game_state makes of the updates. A bad call part way
+    # through then leaves the game as it was
+    game_state = game_state.working_copy()
+
     if hasattr(choice, "tool_calls") and choice.tool_calls:
         for tool_call in choice.tool_calls:
             tool_name = tool_call.function.name
@@ -214,20 +225,22 @@ import json
 from dataclasses import asdict
 from typing import List, Dict
 
-def update_game_state(s3, game_state: GameState, updates: List[Dict], bucket_name: str):
+async def update_game_state(cache: GameCache, game_state: GameState, updates: List[Dict]):
     """
-    Apply updates to the game state and upload the updated version to S3 using a passed-in boto3 resource.
+    Turn the updates into events (army changes, captures, faction defeats) and
+    hand them to the game cache, which applies them and appends them to the
+    game's event log, so a turn only writes what changed.
 
     Args:
-        s3: boto3 S3 resource (e.g., boto3.resource("s3"))
+        cache (GameCache): Game cache the state is persisted through.
         game_state (GameState): Current game state dataclass instance.
         updates (List[Dict]): List of updates returned from apply_tool_call().
-        bucket_name (str): Name of the S3 bucket.
     """
 
     # --------------------------------------------------
-    # Apply each update to the game state
+    # Convert each update to events
     # --------------------------------------------------
+    events = []
     for update in updates:
         update_type = update["type"]
         update_id = update["id"]
@@ -235,45 +248,41 @@ def update_game_state(s3, game_state: GameState, updates: List[Dict], bucket_nam
 
         match update_type:
             case "province":
-                for i, province in enumerate(game_state.provinces):
-                    if province.province_id == update_id:
-                        game_state.provinces[i] = update_data
-                        break
+                events.append({
+                    "type": "army",
+                    "province_id": update_id,
+                    "army": asdict(update_data.army) if update_data.army else None
+                })
+                events.append({
+                    "type": "capture",
+                    "province_id": update_id,
+                    "faction_id": update_data.faction_id
+                })
 
             case "faction":
-                for i, faction in enumerate(game_state.factions):
-                    if faction.faction_id == update_id:
-                        game_state.factions[i] = update_data
-                        break
+                if update_data.is_defeated:
+                    events.append({"type": "defeat", "faction_id": update_id})
 
             case _:
                 print(f"[WARN] Unknown update type: {update_type}")
 
     # --------------------------------------------------
-    # Serialize the updated game state
-    # --------------------------------------------------
-    game_state_json = json.dumps(asdict(game_state), indent=2)
-
-    # --------------------------------------------------
-    # Upload to S3 using resource
+    # Apply and queue for the event log
     # --------------------------------------------------
-    bucket = s3.Bucket(bucket_name)
-    key = f"game-state/game-state-{game_state.game_id}.json"
-    bucket.put_object(Key=key, Body=game_state_json.encode("utf-8"))
+    game_state = await cache.update_state(game_state.game_id, events)
 
-    print(f"[UPLOAD] Updated game state uploaded to s3://{bucket_name}/{key}")
+    print(f"[UPLOAD] {len(events)} events queued for {game_state.game_id}")
 
     return game_state
 
 from llm.client import client
 
-def update_context(s3, bucket_name: str, game_id: str, context: str, new_game_state_yaml: str, advisor_pads: List[str]):
+async def update_context(cache: GameCache, game_id: str, context: str, new_game_state_yaml: str, advisor_pads: List[str]):
     """
-    Update the game context using Gemini and upload the new context to S3.
+    Update the game context using Gemini and store the new context through the game cache.
 
     Args:
-        s3: boto3 S3 resource
-        bucket_name (str): Name of the S3 bucket
+        cache (GameCache): Game cache the context is persisted through
         game_id (str): ID of the game
         context (str): Current game context
         new_game_state_yaml (str): YAML/string representation of the updated game state
@@ -283,7 +292,7 @@ def update_context(s3, bucket_name: str, game_id: str, context: str, new_game_st
     """
 
     # Prompt Gemini for updated context
-    completion = client.chat.completions.create(
+    completion = await client.complete(
         model="google/gemini-2.5-pro",
         messages=[
             {
@@ -313,12 +322,10 @@ Please provide a revised game context that incorporates all updates and is ready
 
     updated_context = completion.choices[0].message.content
 
-    # Upload updated context to S3
-    bucket = s3.Bucket(bucket_name)
-    key = f"context/context-{game_id}.txt"
-    bucket.put_object(Key=key, Body=updated_context.encode("utf-8"))
+    # Upload updated context
+    await cache.set_context(game_id, updated_context)
 
-    print(f"[UPLOAD] Updated context uploaded to s3://{bucket_name}/{key}")
+    print(f"[UPLOAD] Updated context queued for {game_id}")
 
     return updated_context
 
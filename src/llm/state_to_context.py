@@ -2,7 +2,7 @@ import json
 from dataclasses import dataclass, field
 from typing import List
 
-from create_game.schema import GameState, Faction, City, Army, Fort, Port, Province
+from create_game.schema import GameState, Faction, City, Army, Fort, Port, Province, MapSpec
 
 
 # --- JSON Loading Function (Unchanged) ---
@@ -19,13 +19,14 @@ def create_game_state_from_json(json_string: str) -> GameState:
     hydrated_provinces = []
     for p_data in data['provinces']:
         p_copy = p_data.copy()
-        if p_copy.get('city'):
+        # Fort and Port have no fields and serialize to {}, so test for None
+        if p_copy.get('city') is not None:
             p_copy['city'] = City(**p_copy['city'])
-        if p_copy.get('army'):
+        if p_copy.get('army') is not None:
             p_copy['army'] = Army(**p_copy['army'])
-        if p_copy.get('fort'):
+        if p_copy.get('fort') is not None:
             p_copy['fort'] = Fort(**p_copy['fort'])
-        if p_copy.get('port'):
+        if p_copy.get('port') is not None:
             p_copy['port'] = Port(**p_copy['port'])
         hydrated_provinces.append(Province(**p_copy))
 
@@ -35,19 +36,49 @@ def create_game_state_from_json(json_string: str) -> GameState:
         game_over=data['game_over'],
         continents=data['continents'],
         factions=hydrated_factions,
-        provinces=hydrated_provinces
+        provinces=hydrated_provinces,
+        version=data.get('version', 0),
+        map_spec=MapSpec(**data['map_spec']) if data.get('map_spec') else None,
+        geometry_hash=data.get('geometry_hash'),
     )
 
 # --- ID Truncation Helper ---
 def truncate_id(id_str: str) -> str:
     """
-    Truncates an ID string (e.g., 'p_01') to the part after the first '_'.
-    Returns '01'. If no '_' is present, returns the original string.
+    Truncates a UUID to its first group ('3f2a9c1e-...' -> '3f2a9c1e').
+    Not unique, only for ids nothing is looked up by (the game id).
     """
     if '-' in id_str:
         return id_str.split('-', 1)[0]
     return id_str
 
+# --- Short IDs ---
+# Prompts name provinces and factions by their dense id (position in the
+# game's list) as 'p12' / 'f3': unique, a few tokens, and stable for the
+# life of the game. The tools take them back through resolve_province and
+# resolve_faction, which also accept the full UUIDs.
+
+def province_ref(n: int) -> str:
+    return f"p{n}"
+
+def faction_ref(n: int) -> str:
+    return f"f{n}"
+
+def _parse_ref(ref: str, prefix: str, count: int) -> int | None:
+    if len(ref) > 1 and ref[0] == prefix and ref[1:].isdigit():
+        n = int(ref[1:])
+        if n < count:
+            return n
+    return None
+
+def resolve_province(game_state: GameState, ref: str) -> Province | None:
+    n = _parse_ref(ref, 'p', len(game_state.provinces))
+    return game_state.provinces[n] if n is not None else game_state.province(ref)
+
+def resolve_faction(game_state: GameState, ref: str) -> Faction | None:
+    n = _parse_ref(ref, 'f', len(game_state.factions))
+    return game_state.factions[n] if n is not None else game_state.faction(ref)
+
 # --- NEW: Manual YAML Generation Function (No imports) ---
 
 def generate_game_state_yaml_manual(game_state: GameState) -> str:
@@ -55,15 +86,17 @@ def generate_game_state_yaml_manual(game_state: GameState) -> str:
     Converts the entire GameState into a token-efficient, YAML-formatted string
     using manual string building, with no external libraries.
     
-    All 'id' fields are truncated (e.g., 'p_01' -> '01').
+    Provinces and factions are named by short ids ('p12', 'f3'), see province_ref.
     """
     
     # 1. Create Look-up Maps for de-normalization
     faction_lookup = {f.faction_id: f.name for f in game_state.factions}
     
     province_name_lookup = {}
-    for p in game_state.provinces:
+    province_ref_lookup = {}
+    for n, p in enumerate(game_state.provinces):
         province_name_lookup[p.province_id] = "Ocean" if p.is_ocean else p.name
+        province_ref_lookup[p.province_id] = province_ref(n)
 
     # 2. Build the YAML string line by line
     
@@ -77,8 +110,8 @@ def generate_game_state_yaml_manual(game_state: GameState) -> str:
 
     # --- Faction Summary ---
     yaml_lines.append("factions:")
-    for f in game_state.factions:
-        yaml_lines.append(f"  - id: {truncate_id(f.faction_id)}")
+    for n, f in enumerate(game_state.factions):
+        yaml_lines.append(f"  - id: {faction_ref(n)}")
         yaml_lines.append(f"    name: {f.name}")
         yaml_lines.append(f"    defeated: {str(f.is_defeated).lower()}")
         yaml_lines.append(f"    turn_ended: {str(f.turn_ended).lower()}")
@@ -86,7 +119,7 @@ def generate_game_state_yaml_manual(game_state: GameState) -> str:
     # --- Province List ---
     yaml_lines.append("provinces:")
     for p in game_state.provinces:
-        yaml_lines.append(f"  - id: {truncate_id(p.province_id)}")
+        yaml_lines.append(f"  - id: {province_ref_lookup[p.province_id]}")
 
         # --- Details ---
         p_name = province_name_lookup.get(p.province_id, "Unknown")
@@ -119,8 +152,8 @@ def generate_game_state_yaml_manual(game_state: GameState) -> str:
         neighbor_list = []
         for n_id in p.neighbors:
             n_name = province_name_lookup.get(n_id, "Unknown")
-            n_id_truncated = truncate_id(n_id)
-            neighbor_list.append(f"{n_name} ({n_id_truncated})") # e.g., "Latium (01)"
+            n_ref = province_ref_lookup.get(n_id, "?")
+            neighbor_list.append(f"{n_name} ({n_ref})") # e.g., "Latium (p12)"
         
         if neighbor_list:
             yaml_lines.append("    neighbors:")
@@ -130,14 +163,9 @@ def generate_game_state_yaml_manual(game_state: GameState) -> str:
     # 3. Join all lines into a single string
     return "\n".join(yaml_lines)
 
-def process(GAME_STATE_JSON_STRING: str | GameState) -> str:
-
-    if not isinstance(GAME_STATE_JSON_STRING, GameState):
-        # 1. Load the GameState from the JSON string
-        game = create_game_state_from_json(GAME_STATE_JSON_STRING)
-    else:
-        game = GAME_STATE_JSON_STRING
-
-    # 2. Generate and Print the new YAML
-    yaml_output = generate_game_state_yaml_manual(game)
-    return yaml_output
\ No newline at end of file
+def process(game_state: GameState) -> str:
+    """
+    The prompt YAML for a hydrated state. Rendered once per change to the
+    state, so advisor messages between turns reuse it.
+    """
+    return game_state.derived('yaml', generate_game_state_yaml_manual)
\ No newline at end of file
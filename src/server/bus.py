@@ -0,0 +1,240 @@
+import asyncio
+import json
+import os
+from typing import Callable, Dict, Set
+
+# Called with (game_id, message text) for messages published by other workers
+Handler = Callable[[str, str], None]
+
+
+class EventBus:
+    """
+    Carries game messages between server workers.
+
+    Every worker publishes what it would broadcast to its own websocket
+    clients, and receives what other workers publish for the games it has
+    joined (has at least one client for). Messages are already serialized,
+    so they are relayed as-is.
+
+    The base class is the single-process bus: nothing to relay. The others
+    are groundwork for several server processes; main() still runs one,
+    as game state caches, turns and pads are not shared yet.
+    """
+
+    def __init__(self):
+        self.handler: Handler | None = None
+        self.games: Set[str] = set()
+
+    def subscribe(self, handler: Handler):
+        self.handler = handler
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def join(self, game_id: str):
+        self.games.add(game_id)
+
+    def leave(self, game_id: str):
+        self.games.discard(game_id)
+
+    def publish(self, game_id: str, text: str):
+        pass
+
+    def stats(self) -> Dict:
+        return {"backend": "local", "games": len(self.games)}
+
+
+# ==========================================================
+# UNIX SOCKET BUS
+# ==========================================================
+# Workers connect to one broker over a Unix socket and exchange
+# newline-delimited JSON frames:
+#
+#   {"op": "join", "game_id": ...}
+#   {"op": "leave", "game_id": ...}
+#   {"op": "publish", "game_id": ..., "message": text}
+#
+# The broker forwards a publish to every other connection that joined the
+# game. It stands in for a shared broker (Redis, NATS) on a single host.
+
+# A turn_processed message can be far larger than asyncio's 64 KiB line default
+_LINE_LIMIT = 16 * 1024 * 1024
+
+DEFAULT_SOCKET = '/tmp/sketch-game-bus.sock'
+
+def _frame(op: str, game_id: str, message: str | None = None) -> bytes:
+    frame = {"op": op, "game_id": game_id}
+    if message is not None:
+        frame["message"] = message
+    return json.dumps(frame, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+class UnixSocketBus(EventBus):
+    """
+    Worker side of the Unix socket bus. Reconnects until closed and re-joins
+    its games after every reconnect. Frames wait in a bounded outbox while the
+    broker is unreachable and are dropped, with a warning, once it fills up.
+    """
+
+    def __init__(self, path: str, max_queue: int = 1024, reconnect_delay: float = 1.0):
+        super().__init__()
+        self.path = path
+        self.reconnect_delay = reconnect_delay
+
+        self.outbox: asyncio.Queue[bytes] = asyncio.Queue(max_queue)
+        self.task: asyncio.Task | None = None
+        self.connected = False
+
+        self.published = 0
+        self.received = 0
+        self.dropped = 0
+
+    # -------------------- Lifecycle --------------------
+    async def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    async def _run(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path, limit=_LINE_LIMIT)
+            except OSError as e:
+                print(f"[WARN] Event bus broker at {self.path} unreachable: {e}")
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+
+            self.connected = True
+            tasks = [asyncio.create_task(self._read(reader)), asyncio.create_task(self._write(writer))]
+            try:
+                for game_id in self.games:
+                    writer.write(_frame("join", game_id))
+                await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                self.connected = False
+                for t in tasks:
+                    t.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                writer.close()
+
+            print(f"[WARN] Lost event bus broker at {self.path}, reconnecting")
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _read(self, reader: asyncio.StreamReader):
+        while line := await reader.readline():
+            frame = json.loads(line)
+            self.received += 1
+            if self.handler is not None and frame["game_id"] in self.games:
+                self.handler(frame["game_id"], frame["message"])
+
+    async def _write(self, writer: asyncio.StreamWriter):
+        while True:
+            writer.write(await self.outbox.get())
+            await writer.drain()
+
+    def _send(self, frame: bytes):
+        try:
+            self.outbox.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            print("[WARN] Event bus outbox full, dropping frame")
+
+    # -------------------- Messages --------------------
+    def join(self, game_id: str):
+        if game_id not in self.games:
+            super().join(game_id)
+            self._send(_frame("join", game_id))
+
+    def leave(self, game_id: str):
+        if game_id in self.games:
+            super().leave(game_id)
+            self._send(_frame("leave", game_id))
+
+    def publish(self, game_id: str, text: str):
+        self.published += 1
+        self._send(_frame("publish", game_id, text))
+
+    def stats(self) -> Dict:
+        return {
+            "backend": "unix",
+            "path": self.path,
+            "connected": self.connected,
+            "games": len(self.games),
+            "outbox": self.outbox.qsize(),
+            "published": self.published,
+            "received": self.received,
+            "dropped": self.dropped,
+        }
+
+
+class EventBroker:
+    """
+    Relays frames between UnixSocketBus workers. A worker whose socket
+    buffer grows past `max_buffer` bytes is not keeping up and is
+    disconnected; it reconnects and re-joins on its own.
+    """
+
+    def __init__(self, path: str, max_buffer: int = 16 * 1024 * 1024):
+        self.path = path
+        self.max_buffer = max_buffer
+        self.members: Dict[asyncio.StreamWriter, Set[str]] = {}
+
+    async def serve_forever(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        server = await asyncio.start_unix_server(self._member, path=self.path, limit=_LINE_LIMIT)
+        print(f"[INFO] Event bus broker listening on {self.path}")
+        async with server:
+            await server.serve_forever()
+
+    async def _member(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        games = self.members[writer] = set()
+        try:
+            while line := await reader.readline():
+                frame = json.loads(line)
+                match frame["op"]:
+                    case "join":
+                        games.add(frame["game_id"])
+                    case "leave":
+                        games.discard(frame["game_id"])
+                    case "publish":
+                        self._relay(writer, frame["game_id"], line)
+        except (ConnectionError, ValueError) as e:
+            print(f"[WARN] Dropping event bus member: {e!r}")
+        finally:
+            self.members.pop(writer, None)
+            writer.close()
+
+    def _relay(self, sender: asyncio.StreamWriter, game_id: str, line: bytes):
+        for member, games in list(self.members.items()):
+            if member is sender or game_id not in games:
+                continue
+            if member.transport.get_write_buffer_size() > self.max_buffer:
+                print("[WARN] Event bus member fell behind, disconnecting")
+                self.members.pop(member, None)
+                member.close()
+                continue
+            member.write(line)
+
+
+def run_broker(path: str):
+    """Process entry point for the broker."""
+    asyncio.run(EventBroker(path).serve_forever())
+
+
+def make_bus() -> EventBus:
+    """Pick the bus from EVENT_BUS (local, unix)."""
+    backend = os.getenv('EVENT_BUS', 'local')
+    if backend == 'local':
+        return EventBus()
+    if backend == 'unix':
+        return UnixSocketBus(os.getenv('EVENT_BUS_SOCKET', DEFAULT_SOCKET))
+    raise ValueError(f"Unknown EVENT_BUS: {backend}")
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from typing import Dict, Set
+
+from fastapi import WebSocket
+
+from server.bus import EventBus
+
+
+# Identity equality so clients can live in sets
+@dataclass(eq=False)
+class Client:
+    websocket: WebSocket
+    game_id: str
+    queue: asyncio.Queue
+    writer: asyncio.Task | None = None
+
+
+@dataclass
+class GameMetrics:
+    sent: int = 0
+    evicted: int = 0
+    latency_total: float = 0.0
+    latency_max: float = 0.0
+
+    def record(self, latency: float):
+        self.sent += 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+
+
+class ConnectionManager:
+    """
+    Tracks websocket clients per game and delivers messages without letting
+    one slow socket hold up the rest.
+
+    Each client gets a bounded send queue drained by its own writer task, so
+    a broadcast only serializes the message once and enqueues it. A client
+    whose queue is full, or whose send takes longer than `send_timeout`, is
+    considered too far behind and is disconnected. Sockets that error out
+    are removed as soon as their writer notices.
+
+    publish() also hands the message to `bus`, which delivers it to the
+    clients other server workers hold for the same game.
+    """
+
+    def __init__(self, max_queue: int = 64, send_timeout: float = 10.0, bus: EventBus | None = None):
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+
+        self.bus = bus or EventBus()
+        self.bus.subscribe(self.broadcast)
+
+        self.active_games: Dict[str, Set[Client]] = {}
+        self.metrics: Dict[str, GameMetrics] = {}
+
+        # Keeps fire-and-forget close tasks referenced until they finish
+        self._closing: Set[asyncio.Task] = set()
+
+    # -------------------- Lifecycle --------------------
+    async def connect(self, websocket: WebSocket, game_id: str) -> Client:
+        await websocket.accept()
+
+        client = Client(websocket=websocket, game_id=game_id, queue=asyncio.Queue(self.max_queue))
+        client.writer = asyncio.create_task(self._writer(client))
+
+        if game_id not in self.active_games:
+            self.active_games[game_id] = set()
+            self.metrics[game_id] = GameMetrics()
+            self.bus.join(game_id)
+        self.active_games[game_id].add(client)
+        return client
+
+    def disconnect(self, client: Client):
+        """Forget the client and stop its writer. Safe to call more than once."""
+        clients = self.active_games.get(client.game_id)
+        if clients is None or client not in clients:
+            return
+
+        clients.remove(client)
+        if not clients:
+            del self.active_games[client.game_id]
+            del self.metrics[client.game_id]
+            self.bus.leave(client.game_id)
+
+        if client.writer is not None and client.writer is not asyncio.current_task():
+            client.writer.cancel()
+
+    async def close(self):
+        for clients in list(self.active_games.values()):
+            for client in list(clients):
+                self.disconnect(client)
+
+    def _evict(self, client: Client, reason: str):
+        print(f"[WARN] Dropping client {client.websocket.client} from {client.game_id}: {reason}")
+        if client.game_id in self.metrics:
+            self.metrics[client.game_id].evicted += 1
+        self.disconnect(client)
+        # 1013: try again later
+        task = asyncio.create_task(self._close_socket(client.websocket, 1013))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    @staticmethod
+    async def _close_socket(websocket: WebSocket, code: int):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    # -------------------- Sending --------------------
+    def send(self, client: Client, text: str) -> bool:
+        """Queue `text` for one client. Returns False if the client was evicted."""
+        try:
+            client.queue.put_nowait((text, time.perf_counter()))
+            return True
+        except asyncio.QueueFull:
+            self._evict(client, "send queue full")
+            return False
+
+    def send_json(self, client: Client, message: Dict) -> bool:
+        return self.send(client, json.dumps(message))
+
+    def broadcast(self, game_id: str, message: Dict | str) -> int:
+        """Queue `message` for every client in the game. Returns how many accepted it."""
+        text = message if isinstance(message, str) else json.dumps(message)
+        return sum(self.send(c, text) for c in list(self.active_games.get(game_id, ())))
+
+    def publish(self, game_id: str, message: Dict | str) -> int:
+        """broadcast() to this worker's clients and every other worker's."""
+        text = message if isinstance(message, str) else json.dumps(message)
+        self.bus.publish(game_id, text)
+        return self.broadcast(game_id, text)
+
+    async def _writer(self, client: Client):
+        while True:
+            text, enqueued = await client.queue.get()
+            try:
+                await asyncio.wait_for(client.websocket.send_text(text), self.send_timeout)
+            except asyncio.TimeoutError:
+                self._evict(client, "send timed out")
+                return
+            except Exception:
+                # Socket already closed, the receive loop may not have noticed yet
+                self.disconnect(client)
+                return
+
+            metrics = self.metrics.get(client.game_id)
+            if metrics is not None:
+                metrics.record(time.perf_counter() - enqueued)
+
+    # -------------------- Metrics --------------------
+    def stats(self) -> Dict[str, Dict]:
+        stats = {}
+        for game_id, clients in self.active_games.items():
+            metrics = self.metrics[game_id]
+            depths = [c.queue.qsize() for c in clients]
+            stats[game_id] = {
+                "clients": len(clients),
+                "queue_depth_total": sum(depths),
+                "queue_depth_max": max(depths, default=0),
+                "sent": metrics.sent,
+                "evicted": metrics.evicted,
+                "send_latency_avg_ms": 1e3 * metrics.latency_total / metrics.sent if metrics.sent else 0.0,
+                "send_latency_max_ms": 1e3 * metrics.latency_max,
+            }
+        return stats
@@ -0,0 +1,178 @@
+import asyncio
+import multiprocessing
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Awaitable, Callable, Dict, Literal, Set
+
+from create_game.create_game import make_game
+from create_game.schema import GameState
+
+
+class GenerationBusy(Exception):
+    """Every generation slot is taken, try again later."""
+
+
+class GenerationTimeout(Exception):
+    pass
+
+
+@dataclass
+class GenerationJob:
+    owner: str
+    n_players: int
+    grain: int
+    seed: int | None = None
+
+    job_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    status: Literal["pending", "done", "failed"] = "pending"
+    error: str | None = None
+    game_id: str | None = None
+
+    enqueued_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+
+class MapGenerator:
+    """
+    Runs make_game in a process pool so map generation neither blocks the
+    event loop nor serializes on the GIL.
+
+    At most `max_pending` generations may be queued or running; past that
+    new requests fail fast with GenerationBusy. A generation that takes
+    longer than `timeout` raises GenerationTimeout to its caller, but its
+    worker cannot be interrupted, so it keeps its slot until it finishes.
+
+    generate() waits for the map. submit() returns a GenerationJob at once
+    and finishes the game in the background, for clients that poll instead.
+    """
+
+    def __init__(self, workers: int | None = None, max_pending: int | None = None,
+                 timeout: float = 120.0, keep_finished: int = 1000, land_fraction: float | None = None):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.max_pending = max_pending or 2 * self.workers
+        self.timeout = timeout
+        self.land_fraction = land_fraction
+        self.keep_finished = keep_finished
+
+        self.executor: ProcessPoolExecutor | None = None
+        self.pending = 0
+        self.jobs: OrderedDict[str, GenerationJob] = OrderedDict()
+        self.tasks: Set[asyncio.Task] = set()
+
+        self.generated = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.seconds_total = 0.0
+
+    # -------------------- Lifecycle --------------------
+    def start(self):
+        if self.executor is None:
+            # Forking a process that already runs threads (asyncio.to_thread)
+            # can deadlock the child, so workers start from a fresh interpreter
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    async def close(self):
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        if self.executor is not None:
+            # Queued maps are dropped, ones already running are waited for
+            await asyncio.to_thread(self.executor.shutdown, wait=True, cancel_futures=True)
+            self.executor = None
+
+    # -------------------- Generation --------------------
+    def _reserve(self):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise GenerationBusy(f"{self.pending} map generations already pending")
+        self.pending += 1
+
+    def _release(self):
+        self.pending -= 1
+
+    async def _run(self, owner: str, n_players: int, grain: int, seed: int | None = None) -> GameState:
+        """Generate with a slot already reserved."""
+        self.start()
+        try:
+            future = self.executor.submit(make_game, owner, n_players, grain, self.land_fraction, seed)
+        except Exception:
+            self._release()
+            raise
+        # Released when the worker is actually done, not when we stop waiting.
+        # Done callbacks run on the executor's thread, so hop back to the loop
+        loop = asyncio.get_running_loop()
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+
+        start = time.perf_counter()
+        try:
+            game_state = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise GenerationTimeout(f"Map generation took longer than {self.timeout}s")
+
+        self.generated += 1
+        self.seconds_total += time.perf_counter() - start
+        return game_state
+
+    async def generate(self, owner: str, n_players: int, grain: int, seed: int | None = None) -> GameState:
+        self._reserve()
+        return await self._run(owner, n_players, grain, seed)
+
+    def submit(self, owner: str, n_players: int, grain: int,
+               then: Callable[[GameState], Awaitable], game_state: GameState | None = None,
+               seed: int | None = None) -> GenerationJob:
+        """
+        Queue a generation, then `await then(game_state)` in the background.
+        Pass `game_state` to skip generation for a map that is already made.
+        """
+        if game_state is None:
+            self._reserve()
+        job = GenerationJob(owner=owner, n_players=n_players, grain=grain, seed=seed)
+        self.jobs[job.job_id] = job
+        self._trim()
+
+        task = asyncio.create_task(self._complete(job, then, game_state))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return job
+
+    async def _complete(self, job: GenerationJob, then: Callable[[GameState], Awaitable],
+                        game_state: GameState | None):
+        try:
+            if game_state is None:
+                game_state = await self._run(job.owner, job.n_players, job.grain, job.seed)
+            await then(game_state)
+            job.game_id = game_state.game_id
+            job.status = "done"
+        except Exception as e:
+            job.status = "failed"
+            job.error = repr(e)
+            print(f"[ERROR] Map generation {job.job_id} failed: {e!r}")
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id: str) -> GenerationJob | None:
+        return self.jobs.get(job_id)
+
+    def _trim(self):
+        finished = [k for k, j in self.jobs.items() if j.status != "pending"]
+        for k in finished[:max(len(finished) - self.keep_finished, 0)]:
+            del self.jobs[k]
+
+    # -------------------- Metrics --------------------
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "generated": self.generated,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_seconds": self.seconds_total / self.generated if self.generated else 0.0,
+        }
@@ -0,0 +1,34 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict
+
+
+class KeyedLock:
+    """
+    One asyncio.Lock per key, created on first use and dropped once nobody
+    holds or waits on it. Work for the same key runs in arrival order while
+    different keys never wait on each other.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, key: str):
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._users[key] = self._users.get(key, 0) + 1
+
+        try:
+            async with lock:
+                yield
+        finally:
+            self._users[key] -= 1
+            if not self._users[key]:
+                del self._users[key]
+                del self._locks[key]
+
+    def __len__(self) -> int:
+        return len(self._locks)
@@ -1,60 +1,75 @@
 import json
 import os
-from typing import Dict, List
-from dataclasses import asdict
+from typing import Dict, List, Literal
 
 from pydantic import BaseModel
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, RedirectResponse
 import uvicorn
-import boto3
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
 import asyncio
 
 from create_game.schema import GameState
-from create_game.create_game import make_game
-from llm.state_to_context import process as state_to_yaml, create_game_state_from_json
+from llm.state_to_context import process as state_to_yaml, faction_ref
 from llm.context_agent import generate_context
 from llm.advisor_agent import get_advice, update_scratch_pad
 from llm.end_turn_agent import process_turn_end, update_game_state, update_context
+from llm.client import client as llm
+from storage.backend import make_storage
+from storage.cache import GameCache
+from storage.geometry import mutable_dict
+from server.locks import KeyedLock
+from server.connections import ConnectionManager
+from server.bus import make_bus
+from server.turns import TurnScheduler, TurnJob, TurnClaims
+from server.pads import PadUpdater
+from server.generation import MapGenerator, GenerationBusy, GenerationTimeout
+from server.map_pool import MapPool, parse_buckets
 
 load_dotenv()
 
-# -------------------- AWS S3 --------------------
-aws_access_key = os.getenv('BOTO3_ACCESS_KEY') or os.getenv('BOTO3_ACSESS_KEY')
-aws_secret_key = os.getenv('BOTO3_SECRET_KEY')
-bucket_name = 'sketch-game-bucket'
-
-s3 = boto3.resource(
-    's3',
-    aws_access_key_id=aws_access_key,
-    aws_secret_access_key=aws_secret_key,
-    region_name='us-east-1'
+# -------------------- Storage --------------------
+# Backend is picked by STORAGE_BACKEND (s3 | local | memory), see storage.backend
+storage = make_storage()
+
+# Hydrated game state, context and scratch pads, written back every
+# CACHE_FLUSH_INTERVAL seconds (0 = write-through)
+cache = GameCache(
+    storage,
+    flush_interval=float(os.getenv('CACHE_FLUSH_INTERVAL', '5')),
+    max_bytes=int(os.getenv('CACHE_MAX_BYTES', str(256 * 1024 * 1024))),
+    idle_seconds=float(os.getenv('CACHE_IDLE_SECONDS', '600')),
+    state_format=os.getenv('STATE_FORMAT', 'binary'),
+    snapshot_every=int(os.getenv('SNAPSHOT_EVERY', '200')),
 )
-bucket = s3.Bucket(bucket_name)
-
-s3_lock = asyncio.Lock()  # lock for concurrent writes
-
-
-# -------------------- S3 Helpers --------------------
-async def read_s3_text(key: str) -> str:
-    try:
-        obj = bucket.Object(key).get()
-        return obj['Body'].read().decode('utf-8')
-    except s3.meta.client.exceptions.NoSuchKey:
-        print(f"[WARN] Missing key: {key}")
-        return ""
-
 
-async def write_s3_text(key: str, body: str | bytes):
-    async with s3_lock:
-        if isinstance(body, str):
-            body = body.encode('utf-8')
-        bucket.put_object(Key=key, Body=body)
+# Serializes state mutations per game; different games run in parallel
+game_locks = KeyedLock()
 
 
 # -------------------- FastAPI Setup --------------------
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    cache.start()
+    turns.start()
+    generator.start()
+    map_pool.start()
+    await bus.start()
+    yield
+    await pads.close()
+    await map_pool.close()
+    await generator.close()
+    await turns.close()
+    await manager.close()
+    await bus.close()
+    await llm.close()
+    # Persist anything still waiting on write-behind
+    await cache.close()
+
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  
@@ -63,17 +78,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Store connected websocket clients: {game_id: set of WebSockets}
-connected_clients: Dict[str, set] = {}
+# Relays game messages to clients of other server processes. Groundwork
+# for now: main() runs one process, the cache, turns and pads are not shared
+bus = make_bus()
+
+# Connected websocket clients per game, each with its own bounded send queue
+manager = ConnectionManager(
+    max_queue=int(os.getenv('WS_SEND_QUEUE', '64')),
+    send_timeout=float(os.getenv('WS_SEND_TIMEOUT', '10')),
+    bus=bus,
+)
 
 
 # -------------------- WebSocket Handler --------------------
 @app.websocket("/ws/{game_id}")
 async def websocket_endpoint(websocket: WebSocket, game_id: str):
-    await websocket.accept()
-    if game_id not in connected_clients:
-        connected_clients[game_id] = set()
-    connected_clients[game_id].add(websocket)
+    client = await manager.connect(websocket, game_id)
 
     try:
         while True:
@@ -83,68 +103,118 @@ async def websocket_endpoint(websocket: WebSocket, game_id: str):
                 route = message.get('route')
                 payload = message.get('message')
                 if route and payload:
-                    await websocket_handler(game_id, route, payload)
+                    busy = await websocket_handler(game_id, route, payload)
+                    if busy is not None:
+                        manager.send_json(client, {"event": "turn_processing", "job": busy.as_dict()})
 
                 # Echo message back
-                await websocket.send_text(json.dumps({"echo": message}))
+                manager.send_json(client, {"echo": message})
             except json.JSONDecodeError:
-                await websocket.send_text(json.dumps({"error": "Invalid JSON"}))
+                manager.send_json(client, {"error": "Invalid JSON"})
 
     except WebSocketDisconnect:
-        connected_clients[game_id].remove(websocket)
-        if not connected_clients[game_id]:
-            del connected_clients[game_id]
+        pass
+    finally:
+        manager.disconnect(client)
 
 
-async def websocket_handler(game_id: str, route: str, data: Dict):
+async def websocket_handler(game_id: str, route: str, data: Dict) -> TurnJob | None:
+    """Returns the game's in-flight turn job if the message was ignored because of it."""
     if route == "end_turn":
         faction_id = data["faction_id"]
-        game_state_json = await read_s3_text(f'game-state/game-state-{game_id}.json')
-        if not game_state_json:
-            return
 
-        game_state = json.loads(game_state_json)
-        for f in game_state['factions']:
-            if f['faction_id'] == faction_id:
-                f['turn_ended'] = True
+        # Flag flip and the all-ended check must not interleave with another
+        # end_turn for the same game
+        async with game_locks.hold(game_id):
+            # Flags set now would be wiped by the running turn's reset, also
+            # when the turn's claim is all that is left of it. Meanwhile the
+            # state picks up events appended to the log outside this cache
+            busy = turns.active_job(game_id)
+            if busy is None:
+                busy, _ = await asyncio.gather(claims.current(game_id), cache.get_state(game_id, fresh=True))
+            if busy is not None:
+                return busy
 
-        if all(f['turn_ended'] for f in game_state['factions']):
-            print(f"[INFO] All factions ended turn for game {game_id}")
-            await end_turn(game_id)
+            game_state = await cache.update_state(game_id, [{"type": "turn_ended", "faction_id": faction_id}])
+            if not game_state:
+                return
 
-        await write_s3_text(f'game-state/game-state-{game_id}.json', json.dumps(game_state))
+            # Persist now rather than on the next write-behind tick; a
+            # conflicting append merges the log's events in
+            await cache.flush(game_id)
+
+            if all(f.turn_ended for f in game_state.factions):
+                # Only the writer that claims the turn runs it
+                if not await claims.claim(game_id, game_state.version):
+                    return await claims.current(game_id)
+
+                print(f"[INFO] All factions ended turn for game {game_id}")
+                # The version is unique per completed set of flags, so it
+                # identifies the turn and dedupes repeated submissions
+                job = turns.submit(game_id, game_state.version)
+                manager.publish(game_id, {"event": "turn_processing", "job": job.as_dict()})
+
+    return None
 
 
 # -------------------- End Turn Logic --------------------
-async def end_turn(game_id: str):
-    game_state_data = await read_s3_text(f'game-state/game-state-{game_id}.json')
-    context_text = await read_s3_text(f'context/context-{game_id}.txt')
+async def end_turn(game_id: str, job: TurnJob):
+    with job.stage("load"):
+        game_state_instance = await cache.get_state(game_id, fresh=True)
 
-    scratch_pad_texts = []
-    for f in json.loads(game_state_data)['factions']:
-        scratch_pad_texts.append(await read_s3_text(f'advisor-scratch-pad/pad-{game_id}-{f["faction_id"]}.txt'))
+        # Pads still being rewritten after advisor messages are finished first
+        await pads.wait(game_id)
 
-    game_state_instance = create_game_state_from_json(game_state_data)
-    game_state_yaml = state_to_yaml(game_state_data)
+        # Context and every faction's pad are fetched concurrently
+        context_text, scratch_pad_texts = await asyncio.gather(
+            cache.get_context(game_id),
+            cache.get_pads(game_id, [f.faction_id for f in game_state_instance.factions]),
+        )
 
-    updates = process_turn_end(context_text, game_state_yaml, scratch_pad_texts, game_state_instance)
+    with job.stage("process_turn"):
+        game_state_yaml = state_to_yaml(game_state_instance)
+        updates = await process_turn_end(context_text, game_state_yaml, scratch_pad_texts, game_state_instance)
 
-    gs = update_game_state(s3, game_state_instance, updates, bucket_name)
+    with job.stage("apply"):
+        async with game_locks.hold(game_id):
+            gs = await update_game_state(cache, game_state_instance, updates)
 
-    # Reset turn_ended flags
-    for f in gs.factions:
-        f.turn_ended = False
+            # Reset turn_ended flags
+            await cache.update_state(game_id, [{"type": "turn_reset"}])
 
-    new_gs_yaml = state_to_yaml(gs)
-    await update_context(s3, bucket_name, game_id, context_text, new_gs_yaml, scratch_pad_texts)
+    with job.stage("update_context"):
+        new_gs_yaml = state_to_yaml(gs)
+        await update_context(cache, game_id, context_text, new_gs_yaml, scratch_pad_texts)
+
+    with job.stage("broadcast"):
+        # Notify connected websocket clients, serialized once for all of them.
+        # Geometry never changes, clients get it from /geometry/{hash}
+        manager.publish(game_id, {
+            "event": "turn_processed",
+            "job_id": job.job_id,
+            "updates": [{"type": u["type"], "id": u["id"], "data": mutable_dict(u["data"])} for u in updates]
+        })
+
+
+async def run_turn_job(job: TurnJob):
+    try:
+        await end_turn(job.game_id, job)
+    finally:
+        # The turn's events must be in the log before the claim goes, or a
+        # fresh read still sees every flag set and runs the turn again. If
+        # the flush fails the claim stays until TURN_CLAIM_TTL. Failed turns
+        # are released too, so the next end_turn can start them again
+        await cache.flush(job.game_id)
+        await claims.release(job.game_id, job.turn)
 
-    # Notify connected websocket clients
-    if game_id in connected_clients:
-        for ws in connected_clients[game_id]:
-            try:
-                await ws.send_text(json.dumps({"event": "turn_processed", "updates": [asdict(u) for u in updates]}))
-            except Exception:
-                pass
+
+# Turn pipelines run on TURN_WORKERS background workers, never inside a
+# websocket receive loop
+turns = TurnScheduler(run_turn_job, concurrency=int(os.getenv('TURN_WORKERS', '4')))
+
+# Turns in progress, recorded next to the game's log. A claim older than
+# TURN_CLAIM_TTL seconds is from a process that died mid turn
+claims = TurnClaims(storage, ttl=float(os.getenv('TURN_CLAIM_TTL', '1800')))
 
 
 # -------------------- HTTP Endpoints --------------------
@@ -157,47 +227,228 @@ class GameRequest(BaseModel):
     owner: str
     number_people: int
     grain: int
+    # Same seed, same map
+    seed: int | None = None
 
 
-@app.post("/create-game")
-async def create_game(message: GameRequest) -> GameState:
-    game_state = make_game(message.owner, message.number_people, message.grain)
+# Maps are generated in worker processes, MAPGEN_WORKERS defaults to the core count
+generator = MapGenerator(
+    workers=int(os.getenv('MAPGEN_WORKERS', '0')) or None,
+    max_pending=int(os.getenv('MAPGEN_MAX_PENDING', '0')) or None,
+    timeout=float(os.getenv('MAPGEN_TIMEOUT', '120')),
+    # Share of tiles that become land, e.g. 0.3; unset keeps fixed size continents
+    land_fraction=float(os.getenv('MAP_LAND_FRACTION', '0')) or None,
+)
 
-    await write_s3_text(f'game-state/game-state-{game_state.game_id}.json', json.dumps(asdict(game_state)))
+# Ready-made maps for the buckets in MAP_POOL_BUCKETS, e.g. "100x4,500x6"
+map_pool = MapPool(
+    storage,
+    generator,
+    buckets=parse_buckets(os.getenv('MAP_POOL_BUCKETS', '')),
+    size=int(os.getenv('MAP_POOL_SIZE', '2')),
+    encode=cache.log.encode,
+)
+
+
+async def setup_game(game_state: GameState):
+    await cache.set_state(game_state.game_id, game_state)
     game_state_yaml = state_to_yaml(game_state)
-    context = generate_context(game_state_yaml)
-    await write_s3_text(f'context/context-{game_state.game_id}.txt', context)
+    context = await generate_context(game_state_yaml)
+    await cache.set_context(game_state.game_id, context)
 
     for f in [f.faction_id for f in game_state.factions]:
-        await write_s3_text(f'advisor-scratch-pad/pad-{game_state.game_id}-{f}.txt', '')
+        await cache.set_pad(game_state.game_id, f, '')
+    # Upload state, context and every pad as one concurrent batch
+    await cache.flush(game_state.game_id)
 
     print(f"[INFO] Created game {game_state.game_id}")
+
+
+@app.post("/create-game")
+async def create_game(message: GameRequest, wait: bool = True) -> GameState:
+    """
+    With wait=false, answers 202 with a generation job to poll at
+    /create-game/{job_id} instead of holding the request open.
+    """
+    game_state = None
+    if message.seed is None:
+        game_state = await map_pool.claim(message.owner, message.grain, message.number_people)
+
+    try:
+        if not wait:
+            job = generator.submit(message.owner, message.number_people, message.grain,
+                                   then=setup_game, game_state=game_state, seed=message.seed)
+            return JSONResponse(status_code=202, content=job.as_dict())
+
+        if game_state is None:
+            game_state = await generator.generate(message.owner, message.number_people, message.grain, message.seed)
+    except GenerationBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except GenerationTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+    await setup_game(game_state)
     return game_state
 
 
+@app.get("/create-game/{job_id}")
+async def create_game_job(job_id: str):
+    job = generator.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail='Generation job not found')
+
+    result = job.as_dict()
+    if job.status == "done":
+        result["game"] = await cache.get_state(job.game_id)
+    return result
+
+
 class AdvisorMessage(BaseModel):
     game_id: str
     faction_id: str
     message: str
 
 
+def prompt_faction(game_state: GameState, faction_id: str) -> str:
+    """The short id prompts know the faction by."""
+    n = game_state.faction_number(faction_id)
+    return faction_ref(n) if n is not None else faction_id
+
+
+async def update_pad(game_id: str, faction_id: str, messages: List[str]):
+    game_state, context_text, scratch_pad_text = await asyncio.gather(
+        cache.get_state(game_id),
+        cache.get_context(game_id),
+        cache.get_pad(game_id, faction_id),
+    )
+
+    new_scratch_pad = await update_scratch_pad(prompt_faction(game_state, faction_id), context_text,
+                                               state_to_yaml(game_state), scratch_pad_text, '\n---\n'.join(messages))
+    await cache.set_pad(game_id, faction_id, new_scratch_pad)
+
+
+# Messages to the same advisor within PAD_UPDATE_DELAY seconds share one pad rewrite
+pads = PadUpdater(update_pad, delay=float(os.getenv('PAD_UPDATE_DELAY', '1')))
+
+
 @app.post("/advisor")
 async def talk_w_advisor(message: AdvisorMessage):
     m = message
 
-    game_state_data = await read_s3_text(f'game-state/game-state-{m.game_id}.json')
-    context_text = await read_s3_text(f'context/context-{m.game_id}.txt')
-    scratch_pad_text = await read_s3_text(f'advisor-scratch-pad/pad-{m.game_id}-{m.faction_id}.txt')
+    game_state, context_text, scratch_pad_text = await asyncio.gather(
+        cache.get_state(m.game_id, fresh=True),
+        cache.get_context(m.game_id),
+        cache.get_pad(m.game_id, m.faction_id),
+    )
+    if game_state is None:
+        raise HTTPException(status_code=404, detail='Game not found')
 
-    game_state_yaml = state_to_yaml(game_state_data)
-    advice = get_advice(m.faction_id, context_text, game_state_yaml, scratch_pad_text, m.message)
+    advice = await get_advice(prompt_faction(game_state, m.faction_id), context_text, state_to_yaml(game_state),
+                              scratch_pad_text, m.message)
 
-    new_scratch_pad = update_scratch_pad(m.faction_id, context_text, game_state_yaml, scratch_pad_text, m.message)
-    await write_s3_text(f'advisor-scratch-pad/pad-{m.game_id}-{m.faction_id}.txt', new_scratch_pad)
+    # The pad is rewritten in the background, end_turn waits for it
+    pads.submit(m.game_id, m.faction_id, m.message)
 
     return {"advice": advice}
 
 
+@app.get("/geometry/{geometry_hash}")
+async def geometry(geometry_hash: str, request: Request,
+                   encoding: Literal['json', 'polyline'] = 'json', simplify: float = 0.0):
+    """
+    A map's borders, centroids, neighbors and continents. The URL names the
+    content, so responses can be cached forever.
+
+    encoding=polyline sends quantized, delta encoded rings instead of float
+    pairs (see storage.geometry.compact_geometry), and `simplify` is then a
+    Douglas-Peucker tolerance for continent outlines, in map units.
+    """
+    if len(geometry_hash) != 64 or not all(c in '0123456789abcdef' for c in geometry_hash):
+        raise HTTPException(status_code=404, detail='Geometry not found')
+    if not 0 <= simplify <= 0.05:
+        raise HTTPException(status_code=422, detail='simplify must be between 0 and 0.05')
+
+    # One ETag per representation of the blob
+    etag = geometry_hash if encoding == 'json' else f"{geometry_hash}-polyline-{simplify:g}"
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "public, max-age=31536000, immutable"}
+    if request.headers.get('if-none-match') in (f'"{etag}"', '*'):
+        return Response(status_code=304, headers=headers)
+
+    geometry = await cache.log.geometry.get(geometry_hash)
+    if geometry is None:
+        raise HTTPException(status_code=404, detail='Geometry not found')
+    if encoding == 'polyline':
+        content = await asyncio.to_thread(geometry.compact_bytes, simplify)
+    else:
+        content = geometry.json_bytes
+    return Response(content=content, media_type='application/json', headers=headers)
+
+
+@app.get("/games/{game_id}/geometry")
+async def game_geometry(game_id: str, request: Request):
+    game_state = await cache.get_state(game_id)
+    if game_state is None:
+        raise HTTPException(status_code=404, detail='Game not found')
+    if game_state.geometry_hash is None:
+        # Not snapshotted yet, storing the geometry sets the hash
+        await cache.log.geometry.put(game_state)
+    query = f"?{request.url.query}" if request.url.query else ''
+    return RedirectResponse(f"/geometry/{game_state.geometry_hash}{query}")
+
+
+@app.get("/turn-jobs/{job_id}")
+async def turn_job(job_id: str):
+    job = turns.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail='Turn job not found')
+    return job.as_dict()
+
+
+@app.get("/games/{game_id}/turn-jobs")
+async def game_turn_jobs(game_id: str):
+    return [j.as_dict() for j in turns.for_game(game_id)]
+
+
+@app.get("/generation-stats")
+async def generation_stats():
+    return {**generator.stats(), "map_pool": map_pool.stats()}
+
+
+@app.get("/turn-stats")
+async def turn_stats():
+    return turns.stats()
+
+
+@app.get("/connection-stats")
+async def connection_stats():
+    return manager.stats()
+
+
+@app.get("/bus-stats")
+async def bus_stats():
+    return bus.stats()
+
+
+@app.get("/llm-stats")
+async def llm_stats():
+    return llm.stats()
+
+
+@app.get("/pad-stats")
+async def pad_stats():
+    return pads.stats()
+
+
+@app.get("/cache-stats")
+async def cache_stats():
+    return {
+        **cache.stats.as_dict(),
+        "games": len(cache.entries),
+        "bytes": cache.size(),
+        "geometry": cache.log.geometry.stats(),
+    }
+
+
 # -------------------- Main --------------------
 def main():
     uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
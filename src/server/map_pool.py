@@ -0,0 +1,200 @@
+import asyncio
+import json
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Tuple
+
+from create_game.schema import GameState
+from server.generation import MapGenerator, GenerationBusy
+from storage.backend import StorageBackend, PreconditionFailed
+from storage.codec import encode_state, decode_state
+from storage.keys import map_pool_prefix, map_pool_key, map_claim_prefix, map_claim_key
+
+Bucket = Tuple[int, int]    # (grain, n_players)
+
+
+@dataclass
+class BucketStats:
+    hits: int = 0
+    misses: int = 0
+    refills: int = 0
+    refill_failures: int = 0
+    refill_seconds_total: float = 0.0
+    refill_seconds_max: float = 0.0
+
+
+def parse_buckets(spec: str) -> List[Bucket]:
+    """'100x4,500x6' -> [(100, 4), (500, 6)]"""
+    buckets = []
+    for part in spec.split(','):
+        if part.strip():
+            grain, n_players = part.strip().split('x')
+            buckets.append((int(grain), int(n_players)))
+    return buckets
+
+
+class MapPool:
+    """
+    Keeps `size` ready-made maps per (grain, n_players) bucket in storage so
+    /create-game can hand one out instead of generating it.
+
+    Maps live under map-pool/{grain}x{n_players}/. claim() takes one from the
+    in-memory index, marks it taken with a create-only claim object so no
+    other worker hands out the same map, then loads and deletes it. A
+    background task refills buckets through the MapGenerator, re-listing
+    storage first so maps added by other workers count toward the target.
+    Claim objects older than `claim_ttl` seconds were left by a worker that
+    died mid claim; the refill task deletes them so their maps are handed
+    out again.
+    """
+
+    def __init__(self, storage: StorageBackend, generator: MapGenerator, buckets: List[Bucket],
+                 size: int = 2, retry_delay: float = 5.0, encode: Callable = encode_state,
+                 claim_ttl: float = 300.0):
+        self.storage = storage
+        self.generator = generator
+        self.size = size
+        self.retry_delay = retry_delay
+        self.encode = encode
+        self.claim_ttl = claim_ttl
+
+        self.ready: Dict[Bucket, Deque[str]] = {b: deque() for b in buckets}
+        self.stats_by_bucket: Dict[Bucket, BucketStats] = {b: BucketStats() for b in buckets}
+
+        self.wake = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+    # -------------------- Lifecycle --------------------
+    def start(self):
+        if self.ready and self.task is None:
+            self.task = asyncio.create_task(self._refill_loop())
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    # -------------------- Claiming --------------------
+    async def claim(self, owner: str, grain: int, n_players: int) -> GameState | None:
+        """A ready map for a new game, or None if the bucket is empty or not pooled."""
+        bucket = (grain, n_players)
+        ready = self.ready.get(bucket)
+        if ready is None:
+            return None
+
+        try:
+            while ready:
+                key = ready.popleft()
+                map_id = key.rsplit('/', 1)[-1]
+                try:
+                    claim = {"claimed_at": time.time()}
+                    await self.storage.put_if(map_claim_key(map_id), json.dumps(claim).encode('utf-8'), None)
+                except PreconditionFailed:
+                    # Another worker got it first
+                    continue
+
+                try:
+                    body = await self.storage.get(key)
+                    await self.storage.delete(key)
+                    await self.storage.delete(map_claim_key(map_id))
+                except Exception:
+                    # Release the claim so the map can be picked up again
+                    await asyncio.gather(self.storage.delete(map_claim_key(map_id)), return_exceptions=True)
+                    raise
+                if not body:
+                    continue
+
+                game_state = decode_state(body)
+                game_state.game_id = str(uuid.uuid4())
+                game_state.owner = owner
+                game_state.version = 0
+                self.stats_by_bucket[bucket].hits += 1
+                return game_state
+
+            self.stats_by_bucket[bucket].misses += 1
+            return None
+        except Exception as e:
+            # The caller generates the map itself, as on an empty bucket
+            print(f"[WARN] Map pool claim failed: {e!r}")
+            self.stats_by_bucket[bucket].misses += 1
+            return None
+        finally:
+            self.wake.set()
+
+    # -------------------- Refilling --------------------
+    async def _reap_claims(self):
+        keys = await self.storage.list(map_claim_prefix())
+        if not keys:
+            return
+        now = time.time()
+        for key, body in (await self.storage.get_many(keys)).items():
+            # Empty bodies are from before claims were timestamped
+            claimed_at = json.loads(body)["claimed_at"] if body else 0.0
+            if body is not None and now - claimed_at > self.claim_ttl:
+                print(f"[INFO] Releasing abandoned map pool claim {key}")
+                await self.storage.delete(key)
+
+    async def _index(self, bucket: Bucket):
+        prefix = map_pool_prefix(*bucket)
+        self.ready[bucket] = deque(sorted(await self.storage.list(prefix)))
+
+    async def _refill(self, bucket: Bucket):
+        grain, n_players = bucket
+        stats = self.stats_by_bucket[bucket]
+
+        start = time.perf_counter()
+        try:
+            game_state = await self.generator.generate('map-pool', n_players, grain)
+        except GenerationBusy:
+            # Player requests have every slot, not a failure
+            raise
+        except Exception:
+            stats.refill_failures += 1
+            raise
+
+        key = map_pool_key(grain, n_players, str(uuid.uuid4()))
+        await self.storage.put(key, self.encode(game_state, version=0))
+        self.ready[bucket].append(key)
+
+        elapsed = time.perf_counter() - start
+        stats.refills += 1
+        stats.refill_seconds_total += elapsed
+        stats.refill_seconds_max = max(stats.refill_seconds_max, elapsed)
+
+    async def _refill_loop(self):
+        while True:
+            self.wake.clear()
+            try:
+                await self._reap_claims()
+                for bucket in self.ready:
+                    await self._index(bucket)
+                    while len(self.ready[bucket]) < self.size:
+                        await self._refill(bucket)
+            except Exception as e:
+                if not isinstance(e, GenerationBusy):
+                    print(f"[WARN] Map pool refill failed: {e!r}")
+                await asyncio.sleep(self.retry_delay)
+                continue
+
+            await self.wake.wait()
+
+    # -------------------- Metrics --------------------
+    def stats(self) -> Dict[str, Dict]:
+        stats = {}
+        for (grain, n_players), s in self.stats_by_bucket.items():
+            requests = s.hits + s.misses
+            stats[f"{grain}x{n_players}"] = {
+                "ready": len(self.ready[(grain, n_players)]),
+                "target": self.size,
+                "hits": s.hits,
+                "misses": s.misses,
+                "hit_rate": s.hits / requests if requests else 0.0,
+                "refills": s.refills,
+                "refill_failures": s.refill_failures,
+                "refill_avg_seconds": s.refill_seconds_total / s.refills if s.refills else 0.0,
+                "refill_max_seconds": s.refill_seconds_max,
+            }
+        return stats
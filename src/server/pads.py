@@ -0,0 +1,90 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+Key = Tuple[str, str]   # (game_id, faction_id)
+
+
+class PadUpdater:
+    """
+    Rewrites advisor scratch pads in the background so /advisor can answer
+    as soon as the advice is ready.
+
+    submit() records a message and returns at once. Messages for the same
+    (game, faction) that arrive within `delay` seconds of each other, or
+    while that pad is being rewritten, are handed to `update(game_id,
+    faction_id, messages)` together, so a burst costs one model call rather
+    than one per message. wait(game_id) skips the delay and returns once
+    every pad of the game is current, which end_turn does before reading
+    the pads.
+    """
+
+    def __init__(self, update: Callable[[str, str, List[str]], Awaitable], delay: float = 1.0):
+        self.update = update
+        self.delay = delay
+
+        self.pending: Dict[Key, List[str]] = {}
+        self.tasks: Dict[Key, asyncio.Task] = {}
+        self.hurry: Dict[Key, asyncio.Event] = {}
+
+        self.submitted = 0
+        self.updates = 0
+        self.coalesced = 0
+        self.failed = 0
+
+    # -------------------- Lifecycle --------------------
+    async def close(self):
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # -------------------- Updating --------------------
+    def submit(self, game_id: str, faction_id: str, message: str):
+        key = (game_id, faction_id)
+        self.pending.setdefault(key, []).append(message)
+        self.submitted += 1
+        if key not in self.tasks:
+            self.hurry[key] = asyncio.Event()
+            self.tasks[key] = asyncio.create_task(self._run(key))
+
+    async def _run(self, key: Key):
+        try:
+            try:
+                await asyncio.wait_for(self.hurry[key].wait(), self.delay)
+            except asyncio.TimeoutError:
+                pass
+
+            while self.pending.get(key):
+                messages = self.pending.pop(key)
+                self.coalesced += len(messages) - 1
+                try:
+                    await self.update(*key, messages)
+                    self.updates += 1
+                except Exception as e:
+                    self.failed += 1
+                    print(f"[ERROR] Scratch pad update for {key[0]}/{key[1]} failed: {e!r}")
+        finally:
+            # No await since the last pending check, so a message submitted
+            # from here on starts a new task
+            del self.tasks[key]
+            del self.hurry[key]
+
+    async def wait(self, game_id: str):
+        """Finish every queued pad update of `game_id` now."""
+        keys = [k for k in self.tasks if k[0] == game_id]
+        for key in keys:
+            self.hurry[key].set()
+        if keys:
+            # asyncio.wait, unlike gather, leaves the updates running if we are cancelled
+            await asyncio.wait([self.tasks[k] for k in keys])
+
+    # -------------------- Metrics --------------------
+    def stats(self) -> Dict:
+        return {
+            "submitted": self.submitted,
+            "updates": self.updates,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+            "pending": len(self.tasks),
+            "delay": self.delay,
+        }
@@ -0,0 +1,184 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from typing import Awaitable, Callable, Dict, List, Literal
+
+from storage.backend import StorageBackend, PreconditionFailed
+from storage.keys import turn_claim_key
+
+
+@dataclass
+class TurnJob:
+    game_id: str
+    turn: int               # state version when the last faction ended its turn
+
+    status: Literal["queued", "running", "done", "failed"] = "queued"
+    error: str | None = None
+
+    enqueued_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+
+    # Seconds spent in each pipeline stage, in the order they ran
+    stages: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def job_id(self) -> str:
+        return f"{self.game_id}:{self.turn}"
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def as_dict(self) -> Dict:
+        return {"job_id": self.job_id, **asdict(self)}
+
+
+class TurnScheduler:
+    """
+    Runs end-of-turn processing off the websocket receive loop.
+
+    submit() queues a job and returns at once; `concurrency` worker tasks
+    pull jobs and await `run(job)`. Jobs are identified by (game, turn), so
+    submitting the same turn twice returns the existing job. Finished jobs
+    are kept for status queries, oldest dropped past `keep_finished`.
+    """
+
+    def __init__(self, run: Callable[[TurnJob], Awaitable], concurrency: int = 4, keep_finished: int = 1000):
+        self.run = run
+        self.concurrency = concurrency
+        self.keep_finished = keep_finished
+
+        self.jobs: OrderedDict[str, TurnJob] = OrderedDict()
+        self.queue: asyncio.Queue[TurnJob] = asyncio.Queue()
+        self.workers: List[asyncio.Task] = []
+
+    # -------------------- Lifecycle --------------------
+    def start(self):
+        if not self.workers:
+            self.workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def close(self):
+        for w in self.workers:
+            w.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def wait_idle(self):
+        """Wait until every queued job has finished."""
+        await self.queue.join()
+
+    # -------------------- Jobs --------------------
+    def submit(self, game_id: str, turn: int) -> TurnJob:
+        job = TurnJob(game_id=game_id, turn=turn)
+        existing = self.jobs.get(job.job_id)
+        if existing is not None and existing.status != "failed":
+            return existing
+
+        self.jobs[job.job_id] = job
+        self.queue.put_nowait(job)
+        self._trim()
+        return job
+
+    def get(self, job_id: str) -> TurnJob | None:
+        return self.jobs.get(job_id)
+
+    def for_game(self, game_id: str) -> List[TurnJob]:
+        return [j for j in self.jobs.values() if j.game_id == game_id]
+
+    def active_job(self, game_id: str) -> TurnJob | None:
+        return next((j for j in self.for_game(game_id) if j.active), None)
+
+    def _trim(self):
+        finished = [k for k, j in self.jobs.items() if not j.active]
+        for k in finished[:max(len(finished) - self.keep_finished, 0)]:
+            del self.jobs[k]
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                await self.run(job)
+                job.status = "done"
+            except Exception as e:
+                job.status = "failed"
+                job.error = repr(e)
+                print(f"[ERROR] Turn job {job.job_id} failed: {e!r}")
+            finally:
+                job.finished_at = time.time()
+                self.queue.task_done()
+
+    # -------------------- Metrics --------------------
+    def stats(self) -> Dict:
+        counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        for j in self.jobs.values():
+            counts[j.status] += 1
+        return {"workers": len(self.workers), **counts}
+
+
+class TurnClaims:
+    """
+    Marks a game's turn as in progress in storage, so two processes writing
+    the same game's event log never run one turn twice. That covers game
+    state only: context and scratch pads are blind puts read through each
+    process's cache, so a bucket is still served by one server at a time.
+
+    claim() writes the marker with a conditional put and returns False if
+    someone else holds it. While it exists, current() describes the turn
+    and end_turn messages are ignored, as their flags would be wiped by the
+    turn's reset. release() removes it once the turn is done or has failed.
+    A marker older than `ttl` seconds was left by a process that died mid
+    turn and can be claimed over.
+    """
+
+    def __init__(self, storage: StorageBackend, ttl: float = 1800.0):
+        self.storage = storage
+        self.ttl = ttl
+
+    def _live(self, body: bytes | None) -> Dict | None:
+        if not body:
+            return None
+        claim = json.loads(body)
+        return claim if time.time() - claim["claimed_at"] < self.ttl else None
+
+    async def current(self, game_id: str) -> TurnJob | None:
+        """The claimed turn of `game_id`, as a running job, or None."""
+        claim = self._live(await self.storage.get(turn_claim_key(game_id)))
+        if claim is None:
+            return None
+        return TurnJob(game_id=game_id, turn=claim["turn"], status="running",
+                       enqueued_at=claim["claimed_at"], started_at=claim["claimed_at"])
+
+    async def claim(self, game_id: str, turn: int) -> bool:
+        key = turn_claim_key(game_id)
+        body, etag = await self.storage.get_versioned(key)
+        if self._live(body) is not None:
+            return False
+
+        claim = {"turn": turn, "claimed_at": time.time()}
+        try:
+            # Create-only, or replace exactly the stale marker we read
+            await self.storage.put_if(key, json.dumps(claim).encode('utf-8'), etag)
+        except PreconditionFailed:
+            return False
+        return True
+
+    async def release(self, game_id: str, turn: int):
+        key = turn_claim_key(game_id)
+        body = await self.storage.get(key)
+        # A server that took over a stale claim owns it now
+        if body and json.loads(body)["turn"] == turn:
+            await self.storage.delete(key)
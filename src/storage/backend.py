@@ -0,0 +1,325 @@
+import asyncio
+import fcntl
+import hashlib
+import os
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+
+class PreconditionFailed(Exception):
+    """A conditional put found a different version of the object than expected."""
+
+
+class StorageBackend(ABC):
+    """
+    Async key/value blob storage used for game state, context and scratch pads.
+
+    Every method is a coroutine and must never block the event loop, so
+    implementations backed by synchronous clients push the work to a thread.
+    Bulk operations run at most `concurrency` requests at once.
+    """
+
+    def __init__(self, concurrency: int = 16):
+        self.concurrency = concurrency
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None:
+        """Return the raw body stored at `key`, or None if it does not exist."""
+
+    @abstractmethod
+    async def put(self, key: str, body: bytes) -> None:
+        """Store `body` at `key`, replacing any existing object."""
+
+    @abstractmethod
+    async def get_versioned(self, key: str) -> Tuple[bytes | None, str | None]:
+        """Return `(body, etag)` for `key`, or `(None, None)` if it does not exist."""
+
+    @abstractmethod
+    async def put_if(self, key: str, body: bytes, etag: str | None) -> str:
+        """
+        Store `body` only if the object currently has `etag`, or does not
+        exist when `etag` is None. Returns the new etag and raises
+        PreconditionFailed if someone else wrote in between.
+        """
+
+    @abstractmethod
+    async def list(self, prefix: str = '') -> List[str]:
+        """Return every key starting with `prefix`."""
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Remove `key`. Deleting a missing key is not an error."""
+
+    async def get_text(self, key: str) -> str:
+        body = await self.get(key)
+        if body is None:
+            print(f"[WARN] Missing key: {key}")
+            return ""
+        return body.decode('utf-8')
+
+    async def put_text(self, key: str, body: str | bytes) -> None:
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        await self.put(key, body)
+
+    async def _bounded(self, calls) -> List:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(call):
+            async with semaphore:
+                return await call
+
+        return await asyncio.gather(*[run(c) for c in calls])
+
+    async def get_many(self, keys: List[str]) -> Dict[str, bytes | None]:
+        """Fetch `keys` concurrently. Missing keys map to None."""
+        bodies = await self._bounded([self.get(k) for k in keys])
+        return dict(zip(keys, bodies))
+
+    async def put_many(self, items: Dict[str, bytes]) -> None:
+        """Store every `key: body` pair concurrently."""
+        await self._bounded([self.put(k, b) for k, b in items.items()])
+
+
+# -------------------- S3 --------------------
+class S3Storage(StorageBackend):
+    """
+    S3 bucket backend. boto3 is synchronous, so each call runs in the default
+    thread pool via asyncio.to_thread. The low-level client is used because,
+    unlike boto3 resources, it is safe to share between threads.
+    """
+
+    def __init__(self, client, bucket_name: str, concurrency: int = 16):
+        super().__init__(concurrency)
+        self.client = client
+        self.bucket_name = bucket_name
+
+    def _get(self, key: str) -> bytes | None:
+        try:
+            obj = self.client.get_object(Bucket=self.bucket_name, Key=key)
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return obj['Body'].read()
+
+    def _put(self, key: str, body: bytes) -> None:
+        self.client.put_object(Bucket=self.bucket_name, Key=key, Body=body)
+
+    def _get_versioned(self, key: str) -> Tuple[bytes | None, str | None]:
+        try:
+            obj = self.client.get_object(Bucket=self.bucket_name, Key=key)
+        except self.client.exceptions.NoSuchKey:
+            return None, None
+        return obj['Body'].read(), obj['ETag']
+
+    def _put_if(self, key: str, body: bytes, etag: str | None) -> str:
+        # S3 conditional writes: If-Match for updates, If-None-Match for creates
+        condition = {'IfMatch': etag} if etag is not None else {'IfNoneMatch': '*'}
+        try:
+            obj = self.client.put_object(Bucket=self.bucket_name, Key=key, Body=body, **condition)
+        except self.client.exceptions.ClientError as e:
+            if e.response['Error']['Code'] in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                raise PreconditionFailed(key) from e
+            raise
+        return obj['ETag']
+
+    def _list(self, prefix: str) -> List[str]:
+        keys = []
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            keys.extend(obj['Key'] for obj in page.get('Contents', []))
+        return keys
+
+    def _delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket_name, Key=key)
+
+    async def get(self, key: str) -> bytes | None:
+        return await asyncio.to_thread(self._get, key)
+
+    async def put(self, key: str, body: bytes) -> None:
+        await asyncio.to_thread(self._put, key, body)
+
+    async def get_versioned(self, key: str) -> Tuple[bytes | None, str | None]:
+        return await asyncio.to_thread(self._get_versioned, key)
+
+    async def put_if(self, key: str, body: bytes, etag: str | None) -> str:
+        return await asyncio.to_thread(self._put_if, key, body, etag)
+
+    async def list(self, prefix: str = '') -> List[str]:
+        return await asyncio.to_thread(self._list, prefix)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self._delete, key)
+
+
+# -------------------- Local Filesystem --------------------
+class LocalStorage(StorageBackend):
+    """
+    Stores each key as a file under `root`, keeping the '/' separated key
+    layout as directories. Writes go to a temp file and are renamed into
+    place so readers never see a partial object. Conditional puts hold an
+    flock on a sidecar lock file, so they are safe across processes sharing
+    the same directory. Etags are content hashes.
+    """
+
+    def __init__(self, root: str | Path, concurrency: int = 16):
+        super().__init__(concurrency)
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if not path.is_relative_to(self.root.resolve()):
+            raise ValueError(f"Key escapes storage root: {key}")
+        return path
+
+    def _get(self, key: str) -> bytes | None:
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def _put(self, key: str, body: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'.{path.name}.{uuid.uuid4().hex}.tmp')
+        tmp.write_bytes(body)
+        os.replace(tmp, path)
+
+    def _get_versioned(self, key: str) -> Tuple[bytes | None, str | None]:
+        body = self._get(key)
+        if body is None:
+            return None, None
+        return body, hashlib.sha1(body).hexdigest()
+
+    def _put_if(self, key: str, body: bytes, etag: str | None) -> str:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path.with_name(f'.{path.name}.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            _, current = self._get_versioned(key)
+            if current != etag:
+                raise PreconditionFailed(key)
+            self._put(key, body)
+        return hashlib.sha1(body).hexdigest()
+
+    def _list(self, prefix: str) -> List[str]:
+        # Walk only the directory the prefix points into, not the whole root
+        directory = prefix.rpartition('/')[0]
+        base = self._path(directory) if directory else self.root.resolve()
+        if not base.is_dir():
+            return []
+        keys = []
+        for path in base.rglob('*'):
+            # Skip temp and lock files
+            if not path.is_file() or path.name.startswith('.'):
+                continue
+            key = path.relative_to(self.root.resolve()).as_posix()
+            if key.startswith(prefix):
+                keys.append(key)
+        return sorted(keys)
+
+    def _delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+    async def get(self, key: str) -> bytes | None:
+        return await asyncio.to_thread(self._get, key)
+
+    async def put(self, key: str, body: bytes) -> None:
+        await asyncio.to_thread(self._put, key, body)
+
+    async def get_versioned(self, key: str) -> Tuple[bytes | None, str | None]:
+        return await asyncio.to_thread(self._get_versioned, key)
+
+    async def put_if(self, key: str, body: bytes, etag: str | None) -> str:
+        return await asyncio.to_thread(self._put_if, key, body, etag)
+
+    async def list(self, prefix: str = '') -> List[str]:
+        return await asyncio.to_thread(self._list, prefix)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self._delete, key)
+
+
+# -------------------- In-Memory --------------------
+class MemoryStorage(StorageBackend):
+    """Dict backed storage for tests and benchmarks. Optional `latency` (seconds) simulates a remote store."""
+
+    def __init__(self, latency: float = 0.0, concurrency: int = 16):
+        super().__init__(concurrency)
+        self.objects: Dict[str, bytes] = {}
+        self.etags: Dict[str, str] = {}
+        self.latency = latency
+        self._writes = 0
+
+    async def _wait(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def get(self, key: str) -> bytes | None:
+        await self._wait()
+        return self.objects.get(key)
+
+    def _store(self, key: str, body: bytes) -> str:
+        self._writes += 1
+        self.objects[key] = bytes(body)
+        self.etags[key] = str(self._writes)
+        return self.etags[key]
+
+    async def put(self, key: str, body: bytes) -> None:
+        await self._wait()
+        self._store(key, body)
+
+    async def get_versioned(self, key: str) -> Tuple[bytes | None, str | None]:
+        await self._wait()
+        return self.objects.get(key), self.etags.get(key)
+
+    async def put_if(self, key: str, body: bytes, etag: str | None) -> str:
+        await self._wait()
+        # Check and store with no await in between, so this is atomic on the loop
+        if self.etags.get(key) != etag:
+            raise PreconditionFailed(key)
+        return self._store(key, body)
+
+    async def list(self, prefix: str = '') -> List[str]:
+        await self._wait()
+        return sorted(k for k in self.objects if k.startswith(prefix))
+
+    async def delete(self, key: str) -> None:
+        await self._wait()
+        self.objects.pop(key, None)
+        self.etags.pop(key, None)
+
+
+# -------------------- Factory --------------------
+def make_storage() -> StorageBackend:
+    """
+    Build the backend selected by the STORAGE_BACKEND env var:
+    's3' (default), 'local' (files under STORAGE_DIR) or 'memory'.
+    STORAGE_CONCURRENCY caps concurrent requests in bulk operations.
+    """
+    kind = os.getenv('STORAGE_BACKEND', 's3').lower()
+    concurrency = int(os.getenv('STORAGE_CONCURRENCY', '16'))
+
+    if kind == 'memory':
+        return MemoryStorage(concurrency=concurrency)
+
+    if kind == 'local':
+        return LocalStorage(os.getenv('STORAGE_DIR', '.storage'), concurrency=concurrency)
+
+    if kind == 's3':
+        import boto3
+        from botocore.config import Config
+
+        client = boto3.client(
+            's3',
+            aws_access_key_id=os.getenv('BOTO3_ACCESS_KEY') or os.getenv('BOTO3_ACSESS_KEY'),
+            aws_secret_access_key=os.getenv('BOTO3_SECRET_KEY'),
+            region_name='us-east-1',
+            # Enough pooled connections for a full bulk batch
+            config=Config(max_pool_connections=concurrency)
+        )
+        return S3Storage(client, os.getenv('S3_BUCKET', 'sketch-game-bucket'), concurrency=concurrency)
+
+    raise ValueError(f"Unknown STORAGE_BACKEND: {kind}")
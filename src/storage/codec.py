@@ -0,0 +1,329 @@
+"""
+Compact binary encoding for GameState.
+
+Layout (all integers little endian):
+
+    magic 'SGSB' | format version (u8) | compression (u8) | payload
+
+The payload, compressed with zlib unless compression is 0, is a series of
+length-prefixed sections:
+
+    header      game_id, owner (string refs), game_over, state version, counts
+    strings     every distinct id / name, referenced by index everywhere else
+    factions    fixed size records
+    provinces   fixed size records with presence flags for optional fields
+    borders     float64 x/y pairs for every province, concatenated
+    centroids   float64 x/y pairs
+    neighbors   u32 province indices instead of 36 character UUIDs
+    continents  u32 point counts followed by float64 x/y pairs
+    map spec    seed, grain, players, land fraction (NaN for none) and
+                generator version; empty for unseeded games (format 2+)
+    geometry    utf-8 hash of the state's geometry blob, empty if the
+                geometry is inline (format 3+)
+
+Coordinates stay float64 so decoding returns exactly what was encoded.
+Anything that does not start with the magic bytes is read as the original
+JSON format, so existing state files keep loading.
+"""
+import json
+import math
+import struct
+import zlib
+from array import array
+from dataclasses import asdict
+from typing import Dict, List
+
+from create_game.schema import GameState, Faction, Province, City, Army, Fort, Port, MapSpec
+from llm.state_to_context import create_game_state_from_json
+
+MAGIC = b'SGSB'
+FORMAT_VERSION = 3
+
+COMPRESS_NONE = 0
+COMPRESS_ZLIB = 1
+
+_PREAMBLE = struct.Struct('<4sBB')
+_SECTION = struct.Struct('<I')
+_HEADER = struct.Struct('<iiBIIII')
+_FACTION = struct.Struct('<iiB')
+_PROVINCE = struct.Struct('<iiiiBiiII')
+_MAP_SPEC = struct.Struct('<qiidi')
+
+# Province flags
+_OCEAN, _CITY, _CAPITAL, _ARMY, _FORT, _PORT, _BORDER, _CENTROID = (1 << i for i in range(8))
+
+# Faction flags
+_AVAILABLE, _DEFEATED, _TURN_ENDED = (1 << i for i in range(3))
+
+
+class CodecError(ValueError):
+    pass
+
+
+# -------------------- Encoding --------------------
+class _Strings:
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+
+    def ref(self, s: str | None) -> int:
+        if s is None:
+            return -1
+        if s not in self.index:
+            self.index[s] = len(self.index)
+        return self.index[s]
+
+    def pack(self) -> bytes:
+        encoded = [s.encode('utf-8') for s in self.index]
+        lengths = array('I', [len(e) for e in encoded])
+        return _SECTION.pack(len(encoded)) + lengths.tobytes() + b''.join(encoded)
+
+
+def encode_state(game_state: GameState, version: int | None = None, compression: int = COMPRESS_ZLIB) -> bytes:
+    """Encode `game_state`, optionally overriding the stored state version."""
+    gs = game_state
+    strings = _Strings()
+    position = {p.province_id: i for i, p in enumerate(gs.provinces)}
+
+    factions = bytearray()
+    for f in gs.factions:
+        flags = (_AVAILABLE * f.is_availale) | (_DEFEATED * f.is_defeated) | (_TURN_ENDED * f.turn_ended)
+        factions += _FACTION.pack(strings.ref(f.faction_id), strings.ref(f.name), flags)
+
+    provinces = bytearray()
+    borders = array('d')
+    centroids = array('d')
+    neighbors = array('I')
+    for p in gs.provinces:
+        flags = _OCEAN * p.is_ocean
+        if p.city:
+            flags |= _CITY | (_CAPITAL * p.city.is_capital)
+        if p.army:
+            flags |= _ARMY
+        if p.fort:
+            flags |= _FORT
+        if p.port:
+            flags |= _PORT
+        if p.border is not None:
+            flags |= _BORDER
+            for x, y in p.border:
+                borders.append(x)
+                borders.append(y)
+        if p.centriod is not None:
+            flags |= _CENTROID
+            centroids.extend(p.centriod)
+        try:
+            neighbors.extend(position[n] for n in p.neighbors)
+        except KeyError as e:
+            raise CodecError(f"Province {p.province_id} has unknown neighbor {e}")
+
+        provinces += _PROVINCE.pack(
+            strings.ref(p.province_id),
+            strings.ref(p.fractal_id),
+            strings.ref(p.name),
+            strings.ref(p.faction_id),
+            flags,
+            strings.ref(p.army.faction_id) if p.army else -1,
+            p.army.numbers if p.army else 0,
+            len(p.border) if p.border is not None else 0,
+            len(p.neighbors),
+        )
+
+    continent_sizes = array('I')
+    continent_points = array('d')
+    for polygon in gs.continents:
+        continent_sizes.append(len(polygon))
+        for x, y in polygon:
+            continent_points.append(x)
+            continent_points.append(y)
+
+    header = _HEADER.pack(
+        strings.ref(gs.game_id),
+        strings.ref(gs.owner),
+        gs.game_over,
+        gs.version if version is None else version,
+        len(gs.factions),
+        len(gs.provinces),
+        len(gs.continents),
+    )
+
+    spec = b''
+    if gs.map_spec is not None:
+        m = gs.map_spec
+        spec = _MAP_SPEC.pack(
+            m.seed, m.grain, m.n_players,
+            math.nan if m.land_fraction is None else m.land_fraction,
+            m.generator_version,
+        )
+
+    sections = [
+        header,
+        strings.pack(),
+        bytes(factions),
+        bytes(provinces),
+        borders.tobytes(),
+        centroids.tobytes(),
+        neighbors.tobytes(),
+        continent_sizes.tobytes() + continent_points.tobytes(),
+        spec,
+        (gs.geometry_hash or '').encode('utf-8'),
+    ]
+    payload = b''.join(_SECTION.pack(len(s)) + s for s in sections)
+
+    if compression == COMPRESS_ZLIB:
+        payload = zlib.compress(payload, 6)
+    elif compression != COMPRESS_NONE:
+        raise CodecError(f"Unknown compression: {compression}")
+
+    return _PREAMBLE.pack(MAGIC, FORMAT_VERSION, compression) + payload
+
+
+# -------------------- Decoding --------------------
+def _sections(payload: bytes) -> List[memoryview]:
+    view = memoryview(payload)
+    sections = []
+    offset = 0
+    while offset < len(view):
+        (size,) = _SECTION.unpack_from(view, offset)
+        offset += _SECTION.size
+        sections.append(view[offset:offset + size])
+        offset += size
+    return sections
+
+
+def _unpack_strings(section: memoryview) -> List[str]:
+    (count,) = _SECTION.unpack_from(section, 0)
+    lengths = array('I')
+    lengths.frombytes(section[_SECTION.size:_SECTION.size + 4 * count])
+
+    strings = []
+    offset = _SECTION.size + 4 * count
+    for n in lengths:
+        strings.append(bytes(section[offset:offset + n]).decode('utf-8'))
+        offset += n
+    return strings
+
+
+def _pairs(flat: array, start: int, n: int) -> List[List[float]]:
+    return [[flat[2 * i], flat[2 * i + 1]] for i in range(start, start + n)]
+
+
+def _decode_binary(body: bytes) -> GameState:
+    magic, fmt, compression = _PREAMBLE.unpack_from(body, 0)
+    if fmt > FORMAT_VERSION:
+        raise CodecError(f"State format {fmt} is newer than this server understands ({FORMAT_VERSION})")
+
+    payload = body[_PREAMBLE.size:]
+    if compression == COMPRESS_ZLIB:
+        payload = zlib.decompress(payload)
+    elif compression != COMPRESS_NONE:
+        raise CodecError(f"Unknown compression: {compression}")
+
+    header, strings, factions, provinces, borders, centroids, neighbors, continents, *rest = _sections(payload)
+
+    game_id, owner, game_over, version, n_factions, n_provinces, n_continents = _HEADER.unpack(header)
+    strings = _unpack_strings(strings)
+
+    def s(i: int) -> str | None:
+        return strings[i] if i >= 0 else None
+
+    hydrated_factions = []
+    for faction_ref, name, flags in _FACTION.iter_unpack(factions):
+        hydrated_factions.append(Faction(
+            faction_id=s(faction_ref),
+            name=s(name),
+            is_availale=bool(flags & _AVAILABLE),
+            is_defeated=bool(flags & _DEFEATED),
+            turn_ended=bool(flags & _TURN_ENDED),
+        ))
+
+    border_flat = array('d')
+    border_flat.frombytes(borders)
+    centroid_flat = array('d')
+    centroid_flat.frombytes(centroids)
+    neighbor_idx = array('I')
+    neighbor_idx.frombytes(neighbors)
+
+    records = list(_PROVINCE.iter_unpack(provinces))
+    province_ids = [s(r[0]) for r in records]
+
+    hydrated_provinces = []
+    border_at = centroid_at = neighbor_at = 0
+    for province_ref, fractal, name, faction, flags, army_faction, army_numbers, n_border, n_neighbors in records:
+        border = None
+        if flags & _BORDER:
+            border = _pairs(border_flat, border_at, n_border)
+            border_at += n_border
+
+        centroid = None
+        if flags & _CENTROID:
+            centroid = [centroid_flat[2 * centroid_at], centroid_flat[2 * centroid_at + 1]]
+            centroid_at += 1
+
+        hydrated_provinces.append(Province(
+            province_id=s(province_ref),
+            fractal_id=s(fractal),
+            name=s(name),
+            faction_id=s(faction),
+            is_ocean=bool(flags & _OCEAN),
+            border=border,
+            centriod=centroid,
+            city=City(is_capital=bool(flags & _CAPITAL)) if flags & _CITY else None,
+            army=Army(faction_id=s(army_faction), numbers=army_numbers) if flags & _ARMY else None,
+            fort=Fort() if flags & _FORT else None,
+            port=Port() if flags & _PORT else None,
+            neighbors=[province_ids[i] for i in neighbor_idx[neighbor_at:neighbor_at + n_neighbors]],
+        ))
+        neighbor_at += n_neighbors
+
+    sizes = array('I')
+    sizes.frombytes(continents[:4 * n_continents])
+    points = array('d')
+    points.frombytes(continents[4 * n_continents:])
+
+    hydrated_continents = []
+    point_at = 0
+    for n in sizes:
+        hydrated_continents.append(_pairs(points, point_at, n))
+        point_at += n
+
+    map_spec = None
+    if len(rest) > 0 and len(rest[0]):
+        seed, grain, n_players, land_fraction, generator_version = _MAP_SPEC.unpack(rest[0])
+        map_spec = MapSpec(
+            seed=seed,
+            grain=grain,
+            n_players=n_players,
+            land_fraction=None if math.isnan(land_fraction) else land_fraction,
+            generator_version=generator_version,
+        )
+
+    # Empty when the geometry is inline, absent before format 3
+    geometry_hash = bytes(rest[1]).decode('utf-8') if len(rest) > 1 else ''
+
+    return GameState(
+        game_id=s(game_id),
+        owner=s(owner),
+        game_over=bool(game_over),
+        provinces=hydrated_provinces,
+        continents=hydrated_continents,
+        factions=hydrated_factions,
+        version=version,
+        map_spec=map_spec,
+        geometry_hash=geometry_hash or None,
+    )
+
+
+def decode_state(body: bytes) -> GameState:
+    """Decode a stored state in either the binary format or the original JSON."""
+    if body[:len(MAGIC)] == MAGIC:
+        return _decode_binary(body)
+    return create_game_state_from_json(body.decode('utf-8'))
+
+
+def encode_state_json(game_state: GameState, version: int | None = None) -> bytes:
+    """The original JSON format, kept for STATE_FORMAT=json and benchmarks."""
+    data = asdict(game_state)
+    if version is not None:
+        data['version'] = version
+    return json.dumps(data).encode('utf-8')
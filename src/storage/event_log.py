@@ -0,0 +1,202 @@
+import json
+from dataclasses import dataclass
+from typing import Callable, Dict, List
+
+from create_game.schema import GameState, Army
+from storage.backend import StorageBackend
+from storage.codec import encode_state, decode_state
+from storage.geometry import GeometryStore, GeometryError, strip_geometry, attach_geometry
+from storage.keys import game_state_key, game_log_prefix, event_batch_key, snapshot_key
+
+# ==========================================================
+# EVENTS
+# ==========================================================
+# Events are small JSON dicts describing one change to the mutable part of a
+# game. They are applied in order and must be idempotent, because a writer
+# that loses an append race replays its own events on top of the winner's.
+#
+#   {"type": "turn_ended", "faction_id": ...}
+#   {"type": "turn_reset"}
+#   {"type": "army", "province_id": ..., "army": {"faction_id": ..., "numbers": ...} | None}
+#   {"type": "capture", "province_id": ..., "faction_id": ...}
+#   {"type": "defeat", "faction_id": ...}
+#   {"type": "rollback", "to": seq}      state restored to what it was at `seq`
+
+Event = Dict
+
+
+def apply_event(game_state: GameState, event: Event):
+
+    match event["type"]:
+        case "turn_ended":
+            f = game_state.faction(event["faction_id"])
+            if f:
+                f.turn_ended = True
+                game_state.changed()
+
+        case "turn_reset":
+            for f in game_state.factions:
+                f.turn_ended = False
+            game_state.changed()
+
+        case "army":
+            p = game_state.province(event["province_id"])
+            if p:
+                p.army = Army(**event["army"]) if event["army"] else None
+                game_state.changed(p)
+
+        case "capture":
+            p = game_state.province(event["province_id"])
+            if p:
+                p.faction_id = event["faction_id"]
+                game_state.changed(p)
+
+        case "defeat":
+            f = game_state.faction(event["faction_id"])
+            if f:
+                f.is_defeated = True
+                game_state.changed()
+
+        case "rollback":
+            # Resolved by EventLog.load, which restarts from the target state
+            pass
+
+        case _:
+            print(f"[WARN] Unknown event type: {event['type']}")
+
+
+def apply_events(game_state: GameState, events: List[Event]):
+    for event in events:
+        apply_event(game_state, event)
+
+
+# ==========================================================
+# LOG STORAGE
+# ==========================================================
+
+@dataclass
+class LoadedState:
+    state: GameState
+    seq: int                    # last event batch applied, 0 = just the initial snapshot
+    events_since_snapshot: int
+
+
+class EventLog:
+    """
+    Per-game append-only log of event batches plus periodic full snapshots:
+
+        game-log/{game_id}/snapshot-{seq}     state after batch `seq`
+        game-log/{game_id}/events-{seq}.json  the batch that produced `seq`
+
+    Batches are appended with a create-only conditional put, so two writers
+    racing for the same seq cannot both succeed. A state is rebuilt from the
+    latest snapshot at or before the requested seq plus the batches after it.
+    Games that predate the log are read from their full state file as seq 0.
+
+    Snapshots leave out the map geometry, which is stored once through
+    `geometry` and attached again on load.
+    """
+
+    def __init__(self, storage: StorageBackend, encode: Callable = encode_state,
+                 geometry: GeometryStore | None = None):
+        self.storage = storage
+        self.encode = encode
+        self.geometry = geometry or GeometryStore(storage)
+
+    async def _attach(self, game_id: str, state: GameState):
+        if state.geometry_hash is None:
+            # Full state from before the geometry split
+            return
+        geometry = await self.geometry.get(state.geometry_hash)
+        if geometry is None:
+            raise GeometryError(f"Geometry {state.geometry_hash} of {game_id} is missing")
+        attach_geometry(state, geometry)
+
+    async def _index(self, game_id: str):
+        snapshots, batches = [], []
+        prefix = game_log_prefix(game_id)
+        for key in await self.storage.list(prefix):
+            name = key[len(prefix):]
+            if name.startswith('snapshot-'):
+                snapshots.append(int(name[len('snapshot-'):]))
+            elif name.startswith('events-'):
+                batches.append(int(name[len('events-'):-len('.json')]))
+        return sorted(snapshots), sorted(batches)
+
+    async def load(self, game_id: str, upto: int | None = None) -> LoadedState | None:
+        """Rebuild the state as of batch `upto` (default: the latest)."""
+        snapshots, batches = await self._index(game_id)
+        if upto is not None:
+            snapshots = [s for s in snapshots if s <= upto]
+            batches = [b for b in batches if b <= upto]
+
+        if snapshots:
+            base = snapshots[-1]
+            body = await self.storage.get(snapshot_key(game_id, base))
+        else:
+            # Games created before the event log have only the full state file
+            base = 0
+            body = await self.storage.get(game_state_key(game_id))
+        if not body:
+            return None
+
+        state = decode_state(body)
+        await self._attach(game_id, state)
+        tail = [b for b in batches if b > base]
+        bodies = await self.storage.get_many([event_batch_key(game_id, b) for b in tail])
+
+        applied = 0
+        seq = base
+        for b, key in zip(tail, bodies):
+            if b != seq + 1:
+                raise ValueError(f"Gap in event log for {game_id}: {seq} -> {b}")
+            events = json.loads(bodies[key])
+
+            rollback = next((e for e in events if e["type"] == "rollback"), None)
+            if rollback is not None:
+                loaded = await self.load(game_id, upto=rollback["to"])
+                state, applied = loaded.state, 0
+            else:
+                apply_events(state, events)
+                applied += len(events)
+            seq = b
+
+        state.version = seq
+        return LoadedState(state=state, seq=seq, events_since_snapshot=applied)
+
+    async def append(self, game_id: str, seq: int, events: List[Event]) -> int:
+        """Write batch `seq`. Raises PreconditionFailed if it already exists."""
+        body = json.dumps(events, separators=(',', ':')).encode('utf-8')
+        await self.storage.put_if(event_batch_key(game_id, seq), body, None)
+        return len(body)
+
+    async def has_batch(self, game_id: str, seq: int) -> bool:
+        return await self.storage.get(event_batch_key(game_id, seq)) is not None
+
+    async def write_snapshot(self, game_id: str, seq: int, game_state: GameState) -> int:
+        geometry_hash = await self.geometry.put(game_state)
+        body = self.encode(strip_geometry(game_state, geometry_hash), version=seq)
+        await self.storage.put(snapshot_key(game_id, seq), body)
+        return len(body)
+
+    async def history(self, game_id: str) -> List[List[Event]]:
+        """Every event batch in order, for replays."""
+        _, batches = await self._index(game_id)
+        bodies = await self.storage.get_many([event_batch_key(game_id, b) for b in batches])
+        return [json.loads(body) for body in bodies.values()]
+
+    async def rollback(self, game_id: str, to: int) -> GameState:
+        """
+        Restore the game to how it was after batch `to`. This appends a
+        rollback batch rather than deleting anything, so it can itself be
+        undone, and snapshots the restored state so loads stay cheap.
+        """
+        target = await self.load(game_id, upto=to)
+        current = await self.load(game_id)
+        seq = current.seq + 1
+
+        await self.append(game_id, seq, [{"type": "rollback", "to": to}])
+        await self.write_snapshot(game_id, seq, target.state)
+
+        target.state.version = seq
+        return target.state
@@ -0,0 +1,381 @@
+"""
+Immutable map geometry, stored once per map as a content-addressed blob.
+
+Borders, centroids, neighbor lists and continent outlines never change after
+make_game, so snapshots leave them out and reference the blob by the sha256
+of its bytes instead (GameState.geometry_hash). Loading a snapshot attaches
+the geometry again from an in-memory LRU, or from storage on a miss.
+
+Blob layout, zlib compressed, all integers little endian:
+
+    u32 province count, u32 continent count
+    u32 string lengths + utf-8 province ids
+    u8  flags per province (has border, has centroid)
+    u32 border point counts, float64 x/y pairs
+    float64 centroid x/y pairs
+    u32 neighbor counts, u32 neighbor indices
+    u32 continent point counts, float64 x/y pairs
+
+For the wire there is also a compact JSON form (compact_geometry): every
+coordinate is quantized to an integer grid over the unit square and each
+ring is delta encoded with the encoded polyline algorithm, so a frontend
+decodes it with any polyline decoder and a division by `scale`.
+Continent outlines can additionally be simplified with Douglas-Peucker.
+"""
+import dataclasses
+import hashlib
+import json
+import struct
+import zlib
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Dict, List, Tuple
+
+import shapely
+
+from create_game.schema import GameState
+from storage.backend import StorageBackend, PreconditionFailed
+from storage.keys import geometry_key
+
+# Province fields that live in the geometry blob
+GEOMETRY_FIELDS = ('border', 'centriod', 'neighbors')
+
+# Compact form: coordinates become integers in [0, SCALE], uint16 over the unit square
+SCALE = 65535
+
+_COUNTS = struct.Struct('<II')
+_HAS_BORDER, _HAS_CENTROID = 1, 2
+
+Point = List[float]
+
+
+class GeometryError(ValueError):
+    pass
+
+
+@dataclass(eq=False)
+class Geometry:
+    province_ids: List[str]
+    borders: List[List[Point] | None]
+    centroids: List[Point | None]
+    neighbors: List[List[str]]
+    continents: List[List[Point]]
+
+    # Compact encodings already built, by simplify tolerance. Clients ask for
+    # one or two tolerances, so a handful is kept
+    compact: Dict[float, bytes] = field(default_factory=dict, repr=False)
+
+    def compact_bytes(self, simplify: float = 0.0) -> bytes:
+        if simplify not in self.compact:
+            if len(self.compact) >= 4:
+                self.compact.clear()
+            self.compact[simplify] = json.dumps(compact_geometry(self, simplify), separators=(',', ':')).encode('utf-8')
+        return self.compact[simplify]
+
+    @cached_property
+    def json_bytes(self) -> bytes:
+        """What the geometry endpoint serves, built once per blob."""
+        return json.dumps({
+            "provinces": [
+                {"province_id": pid, "border": b, "centriod": c, "neighbors": n}
+                for pid, b, c, n in zip(self.province_ids, self.borders, self.centroids, self.neighbors)
+            ],
+            "continents": self.continents,
+        }, separators=(',', ':')).encode('utf-8')
+
+
+# -------------------- Splitting --------------------
+def extract_geometry(game_state: GameState) -> Geometry:
+    return Geometry(
+        province_ids=[p.province_id for p in game_state.provinces],
+        borders=[p.border for p in game_state.provinces],
+        centroids=[p.centriod for p in game_state.provinces],
+        neighbors=[p.neighbors for p in game_state.provinces],
+        continents=game_state.continents,
+    )
+
+
+def strip_geometry(game_state: GameState, geometry_hash: str) -> GameState:
+    """Shallow copy of the state without geometry, pointing at its blob instead."""
+    return dataclasses.replace(
+        game_state,
+        provinces=[dataclasses.replace(p, border=None, centriod=None, neighbors=[]) for p in game_state.provinces],
+        continents=[],
+        geometry_hash=geometry_hash,
+    )
+
+
+def mutable_dict(obj) -> Dict:
+    """asdict() minus the geometry fields, for messages sent every turn."""
+    return {
+        f.name: dataclasses.asdict(v) if dataclasses.is_dataclass(v) else v
+        for f in dataclasses.fields(obj) if f.name not in GEOMETRY_FIELDS
+        for v in [getattr(obj, f.name)]
+    }
+
+
+def attach_geometry(game_state: GameState, geometry: Geometry):
+    """Put geometry back on a stripped state, in place. The lists are shared, not copied."""
+    if len(geometry.province_ids) != len(game_state.provinces):
+        raise GeometryError(f"Geometry has {len(geometry.province_ids)} provinces, state has {len(game_state.provinces)}")
+
+    for i, p in enumerate(game_state.provinces):
+        if p.province_id != geometry.province_ids[i]:
+            raise GeometryError(f"Province {i} is {p.province_id} in the state but {geometry.province_ids[i]} in the geometry")
+        p.border = geometry.borders[i]
+        p.centriod = geometry.centroids[i]
+        p.neighbors = geometry.neighbors[i]
+    game_state.continents = geometry.continents
+
+
+# -------------------- Compact form --------------------
+def _polyline_ints(values, out: List[str]):
+    """Signed integers as encoded polyline characters."""
+    for v in values:
+        v = ~(v << 1) if v < 0 else v << 1
+        while v >= 0x20:
+            out.append(chr((0x20 | (v & 0x1f)) + 63))
+            v >>= 5
+        out.append(chr(v + 63))
+
+
+def quantize(points: List[Point]) -> List[Tuple[int, int]]:
+    return [(min(max(round(x * SCALE), 0), SCALE), min(max(round(y * SCALE), 0), SCALE)) for x, y in points]
+
+
+def encode_polyline(points: List[Point]) -> str:
+    """Quantize a ring, then encode each point as its x/y step from the previous one."""
+    out: List[str] = []
+    px = py = 0
+    for x, y in quantize(points):
+        _polyline_ints((x - px, y - py), out)
+        px, py = x, y
+    return ''.join(out)
+
+
+def decode_polyline(encoded: str) -> List[Point]:
+    values = []
+    v = shift = 0
+    for c in encoded:
+        b = ord(c) - 63
+        v |= (b & 0x1f) << shift
+        shift += 5
+        if b < 0x20:
+            values.append(~(v >> 1) if v & 1 else v >> 1)
+            v = shift = 0
+
+    points = []
+    x = y = 0
+    for dx, dy in zip(values[::2], values[1::2]):
+        x += dx
+        y += dy
+        points.append([x / SCALE, y / SCALE])
+    return points
+
+
+def simplify_ring(points: List[Point], tolerance: float) -> List[Point]:
+    """Douglas-Peucker, keeping the ring valid. Rings that would collapse stay as they are."""
+    simplified = shapely.Polygon(points).simplify(tolerance, preserve_topology=True)
+    if simplified.is_empty or simplified.geom_type != 'Polygon':
+        return points
+    return [list(c) for c in simplified.exterior.coords]
+
+
+def compact_geometry(geometry: Geometry, simplify: float = 0.0) -> Dict:
+    """
+    {"encoding": "polyline", "scale": SCALE,
+     "provinces": [{"province_id", "border": polyline, "centriod": [qx, qy], "neighbors": [index]}],
+     "continents": [polyline]}
+
+    Neighbors are positions in "provinces" rather than ids. Province borders
+    are never simplified, so neighboring tiles keep sharing exact edges.
+    """
+    position = {pid: i for i, pid in enumerate(geometry.province_ids)}
+    continents = geometry.continents
+    if simplify > 0:
+        continents = [simplify_ring(ring, simplify) for ring in continents]
+
+    return {
+        "encoding": "polyline",
+        "scale": SCALE,
+        "provinces": [
+            {
+                "province_id": pid,
+                "border": encode_polyline(b) if b is not None else None,
+                "centriod": list(quantize([c])[0]) if c is not None else None,
+                "neighbors": [position[n] for n in ns],
+            }
+            for pid, b, c, ns in zip(geometry.province_ids, geometry.borders, geometry.centroids, geometry.neighbors)
+        ],
+        "continents": [encode_polyline(ring) for ring in continents],
+    }
+
+
+# -------------------- Encoding --------------------
+def _points(flat: array, start: int, n: int) -> List[Point]:
+    return [[flat[2 * i], flat[2 * i + 1]] for i in range(start, start + n)]
+
+
+def encode_geometry(geometry: Geometry) -> bytes:
+    position = {pid: i for i, pid in enumerate(geometry.province_ids)}
+
+    ids = [pid.encode('utf-8') for pid in geometry.province_ids]
+    flags = bytearray()
+    border_counts, border_points = array('I'), array('d')
+    centroids = array('d')
+    neighbor_counts, neighbor_idx = array('I'), array('I')
+
+    for border, centroid, neighbors in zip(geometry.borders, geometry.centroids, geometry.neighbors):
+        flags.append((_HAS_BORDER * (border is not None)) | (_HAS_CENTROID * (centroid is not None)))
+        border_counts.append(len(border) if border is not None else 0)
+        for x, y in border or ():
+            border_points.append(x)
+            border_points.append(y)
+        if centroid is not None:
+            centroids.extend(centroid)
+        try:
+            neighbor_idx.extend(position[n] for n in neighbors)
+        except KeyError as e:
+            raise GeometryError(f"Unknown neighbor {e}")
+        neighbor_counts.append(len(neighbors))
+
+    continent_counts, continent_points = array('I'), array('d')
+    for polygon in geometry.continents:
+        continent_counts.append(len(polygon))
+        for x, y in polygon:
+            continent_points.append(x)
+            continent_points.append(y)
+
+    payload = b''.join([
+        _COUNTS.pack(len(ids), len(geometry.continents)),
+        array('I', [len(i) for i in ids]).tobytes(), b''.join(ids),
+        bytes(flags),
+        border_counts.tobytes(), border_points.tobytes(),
+        centroids.tobytes(),
+        neighbor_counts.tobytes(), neighbor_idx.tobytes(),
+        continent_counts.tobytes(), continent_points.tobytes(),
+    ])
+    return zlib.compress(payload, 6)
+
+
+def decode_geometry(body: bytes) -> Geometry:
+    view = memoryview(zlib.decompress(body))
+    n, n_continents = _COUNTS.unpack_from(view, 0)
+    offset = _COUNTS.size
+
+    def take(typecode: str, count: int) -> array:
+        nonlocal offset
+        a = array(typecode)
+        a.frombytes(view[offset:offset + count * a.itemsize])
+        offset += count * a.itemsize
+        return a
+
+    id_lengths = take('I', n)
+    province_ids = []
+    for length in id_lengths:
+        province_ids.append(bytes(view[offset:offset + length]).decode('utf-8'))
+        offset += length
+
+    flags = bytes(view[offset:offset + n])
+    offset += n
+
+    border_counts = take('I', n)
+    border_points = take('d', 2 * sum(border_counts))
+    centroid_points = take('d', 2 * sum(1 for f in flags if f & _HAS_CENTROID))
+    neighbor_counts = take('I', n)
+    neighbor_idx = take('I', sum(neighbor_counts))
+    continent_counts = take('I', n_continents)
+    continent_points = take('d', 2 * sum(continent_counts))
+
+    borders, centroids, neighbors = [], [], []
+    border_at = centroid_at = neighbor_at = 0
+    for i in range(n):
+        if flags[i] & _HAS_BORDER:
+            borders.append(_points(border_points, border_at, border_counts[i]))
+            border_at += border_counts[i]
+        else:
+            borders.append(None)
+        if flags[i] & _HAS_CENTROID:
+            centroids.append([centroid_points[2 * centroid_at], centroid_points[2 * centroid_at + 1]])
+            centroid_at += 1
+        else:
+            centroids.append(None)
+        neighbors.append([province_ids[j] for j in neighbor_idx[neighbor_at:neighbor_at + neighbor_counts[i]]])
+        neighbor_at += neighbor_counts[i]
+
+    continents = []
+    point_at = 0
+    for count in continent_counts:
+        continents.append(_points(continent_points, point_at, count))
+        point_at += count
+
+    return Geometry(province_ids, borders, centroids, neighbors, continents)
+
+
+# -------------------- Storage --------------------
+class GeometryStore:
+    """
+    Content-addressed geometry blobs under geometry/{sha256}. Blobs are
+    written with a create-only put and never change, so any number of
+    decoded blobs can be cached without invalidation; the most recently
+    used `max_cached` are kept.
+    """
+
+    def __init__(self, storage: StorageBackend, max_cached: int = 64):
+        self.storage = storage
+        self.max_cached = max_cached
+        self.cached: OrderedDict[str, Geometry] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def _remember(self, geometry_hash: str, geometry: Geometry):
+        self.cached[geometry_hash] = geometry
+        self.cached.move_to_end(geometry_hash)
+        while len(self.cached) > self.max_cached:
+            self.cached.popitem(last=False)
+
+    async def put(self, game_state: GameState) -> str:
+        """Store the state's geometry if new, set and return its hash."""
+        if game_state.geometry_hash is not None:
+            return game_state.geometry_hash
+
+        geometry = extract_geometry(game_state)
+        body = encode_geometry(geometry)
+        geometry_hash = hashlib.sha256(body).hexdigest()
+
+        if geometry_hash not in self.cached:
+            try:
+                await self.storage.put_if(geometry_key(geometry_hash), body, None)
+                self.writes += 1
+            except PreconditionFailed:
+                # Same map stored before, same bytes
+                pass
+            self._remember(geometry_hash, geometry)
+
+        game_state.geometry_hash = geometry_hash
+        return geometry_hash
+
+    async def get(self, geometry_hash: str) -> Geometry | None:
+        geometry = self.cached.get(geometry_hash)
+        if geometry is not None:
+            self.hits += 1
+            self.cached.move_to_end(geometry_hash)
+            return geometry
+
+        self.misses += 1
+        body = await self.storage.get(geometry_key(geometry_hash))
+        if body is None:
+            return None
+        if hashlib.sha256(body).hexdigest() != geometry_hash:
+            raise GeometryError(f"Geometry blob {geometry_hash} does not match its hash")
+
+        geometry = decode_geometry(body)
+        self._remember(geometry_hash, geometry)
+        return geometry
+
+    def stats(self) -> Dict:
+        return {"cached": len(self.cached), "hits": self.hits, "misses": self.misses, "writes": self.writes}
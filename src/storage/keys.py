@@ -0,0 +1,53 @@
+def game_state_key(game_id: str) -> str:
+    # Full state file of games created before the event log (storage.event_log),
+    # which reads it as their initial snapshot
+    return f'game-state/game-state-{game_id}.json'
+
+
+def context_key(game_id: str) -> str:
+    return f'context/context-{game_id}.txt'
+
+
+def scratch_pad_key(game_id: str, faction_id: str) -> str:
+    return f'advisor-scratch-pad/pad-{game_id}-{faction_id}.txt'
+
+
+def game_log_prefix(game_id: str) -> str:
+    return f'game-log/{game_id}/'
+
+
+def event_batch_key(game_id: str, seq: int) -> str:
+    return f'{game_log_prefix(game_id)}events-{seq:010d}.json'
+
+
+def snapshot_key(game_id: str, seq: int) -> str:
+    # Encoded with storage.codec, binary or JSON depending on STATE_FORMAT
+    return f'{game_log_prefix(game_id)}snapshot-{seq:010d}'
+
+
+def geometry_key(geometry_hash: str) -> str:
+    # Content addressed, written once and never modified
+    return f'geometry/{geometry_hash}'
+
+
+def map_pool_prefix(grain: int, n_players: int) -> str:
+    return f'map-pool/{grain}x{n_players}/'
+
+
+def map_pool_key(grain: int, n_players: int, map_id: str) -> str:
+    # Encoded with storage.codec like snapshots
+    return f'{map_pool_prefix(grain, n_players)}{map_id}'
+
+
+def map_claim_prefix() -> str:
+    return 'map-pool-claims/'
+
+
+def map_claim_key(map_id: str) -> str:
+    # Created once, conditionally, by whichever worker hands the map out
+    return f'{map_claim_prefix()}{map_id}'
+
+
+def turn_claim_key(game_id: str) -> str:
+    # Exists while a server is processing the game's turn, see server.turns.TurnClaims
+    return f'turn-claims/{game_id}.json'